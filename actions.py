@@ -4,6 +4,9 @@ from map_objects.coords import Coords
 import color
 import exceptions
 
+# How far away dormant monsters hear a fight, see `TurnScheduler.make_noise`.
+COMBAT_NOISE_RADIUS = 10
+
 class Action: 
 
     def __init__(self, entity) -> None:
@@ -32,7 +35,7 @@ class ActionWithDirection(Action):
     @property
     def dest_xy(self) -> Coords:
         """Returns this actions destination."""
-        return Coords(self.entity.location.x + self.dx, self.entity.location.y + self.dy)
+        return self.entity.location.offset(self.dx, self.dy)
 
     @property
     def blocking_entity(self):
@@ -56,6 +59,7 @@ class MeleeAction(ActionWithDirection):
         damage = self.entity.fighter.power - target.fighter.defense
 
         attack_desc = f"{self.entity.name.capitalize()} attacks {target.name}"
+        self.engine.game_map.scheduler.make_noise(target.location, COMBAT_NOISE_RADIUS)
 
         if self.entity is self.engine.player:
             attack_color = color.player_atk
@@ -84,7 +88,7 @@ class MovementAction(ActionWithDirection):
         if not self.engine.game_map.is_in_bounds(self.dest_xy):            
             # Destination is out of bounds.
             raise exceptions.Impossible("That way is blocked.")
-        if not self.engine.game_map.tiles["walkable"][self.dest_xy.x, self.dest_xy.y]:
+        if not self.engine.game_map.tiles["walkable"][self.dest_xy]:
             # Destination is blocked by a tile.
             raise exceptions.Impossible("That way is blocked.")
         if self.engine.game_map.get_blocking_entity_at_location(self.dest_xy):
@@ -100,13 +104,13 @@ class ItemAction(Action):
         super().__init__(entity)
         self.item = item
         if not target_xy:
-            target_xy = entity.location.x, entity.location.y
+            target_xy = entity.location
         self.target_xy = target_xy
 
     @property
     def target_actor(self):
         """Return the actor at this actions destination."""
-        return self.engine.game_map.get_actor_at_location(Coords(*self.target_xy))
+        return self.engine.game_map.get_actor_at_location(Coords.from_tuple(self.target_xy))
 
     def perform(self) -> None:
         """Invoke the items ability, this action will be given to provide context."""
@@ -121,17 +125,22 @@ class PickupAction(Action):
     def perform(self) -> None:
         inventory = self.entity.inventory
 
-        for item in self.engine.game_map.items:
-            if self.entity.location == item.location:
-                if len(inventory.items) >= inventory.capacity:
-                    raise exceptions.Impossible("Your inventory is full.")
-
-                self.engine.game_map.entities.remove(item)
-                item.parent = self.entity.inventory
-                inventory.items.append(item)
-
-                self.engine.message_log.add_message(f"You picked up the {item.name}!")
-                return
+        game_map = self.engine.game_map
+        # Sorted, so the same item is picked up from a pile every time the game is played.
+        items = sorted(
+            (entity for entity in game_map.get_entities_at_location(self.entity.location) if entity in game_map.items),
+            key=lambda item: item.name,
+        )
+        for item in items:
+            if len(inventory.items) >= inventory.capacity:
+                raise exceptions.Impossible("Your inventory is full.")
+
+            game_map.remove_entity(item)
+            item.parent = self.entity.inventory
+            inventory.items.append(item)
+
+            self.engine.message_log.add_message(f"You picked up the {item.name}!")
+            return
 
         raise exceptions.Impossible("There is nothing here to pick up.")
 
@@ -0,0 +1,103 @@
+"""Generate many dungeon levels of a run in parallel worker processes.
+
+Example:
+    python batch_generate.py --count 200 --seed 42 --processes 4
+"""
+import argparse
+import multiprocessing
+import time
+from typing import Dict, List, Optional, Tuple
+
+from map_objects.level_store import LevelStore
+from map_objects.procedual_generator import LevelData, generate_level
+from seeding import level_rng
+
+
+class BatchResult:
+    def __init__(self, levels: List[LevelData], elapsed: float, processes: int):
+        self.levels = levels
+        self.elapsed = elapsed
+        self.processes = processes
+
+    @property
+    def levels_per_second(self) -> float:
+        if self.elapsed <= 0:
+            return 0.0
+        return len(self.levels) / self.elapsed
+
+    def __str__(self) -> str:
+        return (
+            f"{len(self.levels)} levels with {self.processes} processes in {self.elapsed:.3f}s "
+            f"({self.levels_per_second:.1f} levels/s)"
+        )
+
+
+def _generate_one(job: Tuple[int, int, Dict[str, int]]) -> LevelData:
+    """Worker entry point, generate the level with the given number of a run."""
+    seed, level, params = job
+    return generate_level(rng=level_rng(seed, level), **params)
+
+
+def generate_batch(
+    seed: int,
+    count: int,
+    processes: Optional[int] = None,
+    first_level: int = 1,
+    **params: int,
+) -> BatchResult:
+    """Generate levels `first_level` to `first_level + count - 1` of the run with this seed.
+
+    Every level draws from its own `level_rng` stream, so the result is the same whatever
+    the number of processes, and levels are returned in order.
+    `params` are the size and spawn arguments of `generate_level`.
+    `processes` defaults to one per CPU, with 1 everything runs in this process.
+    """
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    jobs = [(seed, level, params) for level in range(first_level, first_level + count)]
+
+    start = time.perf_counter()
+    if processes <= 1:
+        levels = [_generate_one(job) for job in jobs]
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            # Levels only carry compact tile ids and spawn names, so they are cheap to send back.
+            levels = list(pool.imap(_generate_one, jobs, chunksize=max(1, count // (processes * 4))))
+    return BatchResult(levels, time.perf_counter() - start, processes)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=100, help="number of levels to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=None, help="worker processes, defaults to one per CPU")
+    parser.add_argument("--map-width", type=int, default=80)
+    parser.add_argument("--map-height", type=int, default=43)
+    parser.add_argument("--room-min-size", type=int, default=6)
+    parser.add_argument("--room-max-size", type=int, default=10)
+    parser.add_argument("--max-rooms", type=int, default=30)
+    parser.add_argument("--max-monsters-per-room", type=int, default=2)
+    parser.add_argument("--max-items-per-room", type=int, default=2)
+    parser.add_argument("--store", metavar="DIRECTORY", help="save the generated levels to this level store")
+    args = parser.parse_args()
+
+    params = dict(
+        map_width=args.map_width,
+        map_height=args.map_height,
+        room_min_size=args.room_min_size,
+        room_max_size=args.room_max_size,
+        max_rooms=args.max_rooms,
+        max_monsters_per_room=args.max_monsters_per_room,
+        max_items_per_room=args.max_items_per_room,
+    )
+    result = generate_batch(args.seed, args.count, args.processes, **params)
+    print(result)
+
+    if args.store:
+        store = LevelStore(args.store)
+        for level, level_data in enumerate(result.levels, start=1):
+            store.save(args.seed, level, level_data, **params)
+
+
+if __name__ == "__main__":
+    main()
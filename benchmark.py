@@ -0,0 +1,218 @@
+"""Time the hot paths of the game with fixed seeds and print the results as JSON lines.
+
+Examples:
+    python benchmark.py --output before.jsonl
+    python benchmark.py --compare before.jsonl
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, Iterator, List
+
+import numpy
+import tcod
+
+from engine import Engine
+from map_objects import entity_factories
+from map_objects.coords import Coords
+from map_objects.procedual_generator import generate_dungeon
+from message_log import MessageLog
+from savegame import load_game, save_game
+from seeding import level_rng, rng_for
+from setup_game import new_engine
+
+SEED = 1234
+
+
+class Benchmark:
+    def __init__(self, name: str, params: Dict[str, int], setup: Callable[[], Callable[[], None]]):
+        """`setup` prepares the state and returns the function being timed."""
+        self.name = name
+        self.params = params
+        self.setup = setup
+
+    @property
+    def key(self) -> str:
+        return self.name + "".join(f" {key}={value}" for key, value in self.params.items())
+
+    def run(self, repeat: int) -> Dict:
+        function = self.setup()
+        timings: List[float] = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+        return {
+            "benchmark": self.key,
+            "name": self.name,
+            "params": self.params,
+            "repeat": repeat,
+            "min": min(timings),
+            "median": statistics.median(timings),
+            "mean": statistics.fmean(timings),
+        }
+
+
+def engine_with_monsters(monsters: int) -> Engine:
+    """Return an engine on a large map holding exactly `monsters` living monsters."""
+    engine = new_engine(seed=SEED, map_width=200, map_height=200, max_rooms=400, max_monsters_per_room=0)
+    game_map = engine.game_map
+    # The player should survive any number of turns.
+    engine.player.fighter.max_hp = engine.player.fighter.hp = 10 ** 9
+
+    free = [
+        Coords(int(x), int(y))
+        for x, y in zip(*game_map.tiles["walkable"].nonzero())
+        if not game_map.has_entity_at_location(Coords(int(x), int(y)))
+    ]
+    for location in rng_for(SEED, "benchmark").sample(free, monsters):
+        entity_factories.orc.spawn(game_map, location)
+    return engine
+
+
+def bench_generate(map_width: int, map_height: int, max_rooms: int) -> Callable[[], None]:
+    engine = Engine(player=entity_factories.player.instantiate(), seed=SEED)
+
+    def run() -> None:
+        generate_dungeon(
+            max_rooms=max_rooms,
+            room_min_size=6,
+            room_max_size=10,
+            map_width=map_width,
+            map_height=map_height,
+            max_monsters_per_room=2,
+            max_items_per_room=2,
+            engine=engine,
+            rng=level_rng(SEED, 1),
+        )
+
+    return run
+
+
+def bench_update_fov(map_width: int, map_height: int) -> Callable[[], None]:
+    engine = new_engine(seed=SEED, map_width=map_width, map_height=map_height, max_rooms=map_width * map_height // 100)
+    return engine.update_fov
+
+
+def bench_update_fov_dirty(map_width: int, map_height: int) -> Callable[[], None]:
+    """Time a full recompute, by invalidating the tiles before every call."""
+    engine = new_engine(seed=SEED, map_width=map_width, map_height=map_height, max_rooms=map_width * map_height // 100)
+
+    def run() -> None:
+        engine.game_map.mark_tiles_changed()
+        engine.update_fov()
+
+    return run
+
+
+def bench_enemy_turns(monsters: int) -> Callable[[], None]:
+    engine = engine_with_monsters(monsters)
+    return engine.handle_enemy_turns
+
+
+def bench_render_map(map_width: int, map_height: int) -> Callable[[], None]:
+    engine = new_engine(seed=SEED, map_width=map_width, map_height=map_height, max_rooms=map_width * map_height // 100)
+    console = tcod.Console(map_width, map_height, order="F")
+    return lambda: engine.game_map.render(console)
+
+
+def bench_save_game(map_width: int, map_height: int) -> Callable[[], None]:
+    engine = new_engine(seed=SEED, map_width=map_width, map_height=map_height, max_rooms=map_width * map_height // 100)
+    path = os.path.join(tempfile.mkdtemp(), "benchmark.npz")
+    return lambda: save_game(engine, path)
+
+
+def bench_load_game(map_width: int, map_height: int) -> Callable[[], None]:
+    engine = new_engine(seed=SEED, map_width=map_width, map_height=map_height, max_rooms=map_width * map_height // 100)
+    path = os.path.join(tempfile.mkdtemp(), "benchmark.npz")
+    save_game(engine, path)
+    return lambda: load_game(path)
+
+
+def bench_render_messages(messages: int) -> Callable[[], None]:
+    log = MessageLog()
+    for i in range(messages):
+        log.add_message(f"Message number {i} is long enough to be wrapped across several lines of the log.")
+    console = tcod.Console(80, 50, order="F")
+    return lambda: log.render(console, x=21, y=45, width=40, height=5)
+
+
+def benchmarks() -> Iterator[Benchmark]:
+    for width, height, rooms in ((80, 43, 30), (200, 200, 400), (500, 500, 2500), (1000, 1000, 5000)):
+        params = {"width": width, "height": height, "max_rooms": rooms}
+        yield Benchmark(
+            "generate_dungeon", params, lambda w=width, h=height, r=rooms: bench_generate(w, h, r)
+        )
+    for width, height in ((80, 43), (500, 500)):
+        params = {"width": width, "height": height}
+        yield Benchmark("update_fov", params, lambda w=width, h=height: bench_update_fov(w, h))
+        yield Benchmark(
+            "update_fov_dirty", params, lambda w=width, h=height: bench_update_fov_dirty(w, h)
+        )
+        yield Benchmark("render_map", params, lambda w=width, h=height: bench_render_map(w, h))
+        yield Benchmark("save_game", params, lambda w=width, h=height: bench_save_game(w, h))
+        yield Benchmark("load_game", params, lambda w=width, h=height: bench_load_game(w, h))
+    for monsters in (10, 100, 1000):
+        yield Benchmark(
+            "handle_enemy_turns", {"monsters": monsters}, lambda m=monsters: bench_enemy_turns(m)
+        )
+    for messages in (100, 10000):
+        yield Benchmark(
+            "render_messages", {"messages": messages}, lambda m=messages: bench_render_messages(m)
+        )
+
+
+def compare(results: List[Dict], baseline_path: str) -> None:
+    """Print how each result changed relative to a previous run."""
+    with open(baseline_path, encoding="utf-8") as file:
+        baseline = {row["benchmark"]: row for row in map(json.loads, file) if "benchmark" in row}
+    for row in results:
+        old = baseline.get(row["benchmark"])
+        if old is None:
+            print(f"{row['benchmark']:<50} {row['median'] * 1000:10.3f}ms (new)", file=sys.stderr)
+            continue
+        ratio = row["median"] / old["median"] if old["median"] else float("inf")
+        print(
+            f"{row['benchmark']:<50} {old['median'] * 1000:10.3f}ms -> {row['median'] * 1000:10.3f}ms"
+            f" ({ratio:.2f}x)",
+            file=sys.stderr,
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--output", help="write the results to this file instead of stdout")
+    parser.add_argument("--compare", help="a previous output file to compare against")
+    args = parser.parse_args()
+
+    results = []
+    for benchmark in benchmarks():
+        if args.filter in benchmark.key:
+            results.append(benchmark.run(args.repeat))
+
+    header = {
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "tcod": tcod.__version__,
+        "seed": SEED,
+    }
+    lines = [json.dumps(header)] + [json.dumps(row) for row in results]
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+    else:
+        print("\n".join(lines))
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
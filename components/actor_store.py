@@ -0,0 +1,147 @@
+from typing import List, Optional
+
+import numpy as np  # type: ignore
+
+from map_objects.chunked_array import HASH_MODULUS, values_hash
+
+# Per-actor columns, all indexed by `Fighter.store_index`.
+STAT_COLUMNS = ("hp", "max_hp", "defense", "power")
+POSITION_COLUMNS = ("x", "y")
+
+
+class StoredStat:
+    """A `Fighter` attribute which lives in the matching `ActorStore` column.
+
+    While the fighter isn't attached to a store, e.g. on a prototype, the value is kept on
+    the fighter itself.
+    """
+
+    def __init__(self, column: str):
+        self.column = column
+
+    def __get__(self, fighter, owner=None) -> int:
+        if fighter is None:
+            return self
+        if fighter.store is None:
+            return fighter.detached_stats[self.column]
+        return int(getattr(fighter.store, self.column)[fighter.store_index])
+
+    def __set__(self, fighter, value: int) -> None:
+        if fighter.store is None:
+            fighter.detached_stats[self.column] = value
+        else:
+            getattr(fighter.store, self.column)[fighter.store_index] = value
+            fighter.store.rehash(fighter.store_index)
+
+
+class ActorStore:
+    """Struct-of-arrays storage for the actors of one map.
+
+    Positions, fighter stats and alive flags are kept in parallel NumPy arrays, so that bulk
+    queries such as area damage or visibility filtering are single vectorized operations.
+    `Fighter` reads and writes its stats here, and `GameMap` keeps the positions and alive
+    flags in sync as actors move and die.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.actors: List[Optional[object]] = [None] * capacity
+        self.x = np.zeros(capacity, dtype=np.int32)
+        self.y = np.zeros(capacity, dtype=np.int32)
+        self.hp = np.zeros(capacity, dtype=np.int32)
+        self.max_hp = np.zeros(capacity, dtype=np.int32)
+        self.defense = np.zeros(capacity, dtype=np.int32)
+        self.power = np.zeros(capacity, dtype=np.int32)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.in_use = np.zeros(capacity, dtype=bool)
+        # The sum of a hash of every actors position, HP and alive flag, updated as they change
+        # so the state digest never visits every actor. It doesn't depend on the row order.
+        self.state_hash = 0
+        self._row_hashes: List[int] = [0] * capacity
+        # Free rows, popped from the end so the lowest rows are reused first.
+        self._free: List[int] = list(range(capacity - 1, -1, -1))
+
+    def __len__(self) -> int:
+        return len(self.actors) - len(self._free)
+
+    def add(self, actor) -> int:
+        """Move the actors state into a free row and attach its fighter to it.
+
+        A fighter still attached to the store of another map is detached from it first.
+        """
+        fighter = actor.fighter
+        if fighter.store is not None:
+            fighter.store.remove(actor)
+        if not self._free:
+            self._grow()
+        index = self._free.pop()
+        for column in STAT_COLUMNS:
+            getattr(self, column)[index] = getattr(fighter, column)
+        self.x[index], self.y[index] = actor.location
+        self.alive[index] = actor.is_alive
+        self.in_use[index] = True
+        self.actors[index] = actor
+        fighter.store = self
+        fighter.store_index = index
+        self.rehash(index)
+        return index
+
+    def remove(self, actor) -> None:
+        """Detach the actors fighter, copying its stats back onto it, and free its row.
+
+        Nothing is done if the fighter is attached to another store, e.g. after the actor was
+        added to a new map before being removed from its old one.
+        """
+        fighter = actor.fighter
+        if fighter.store is not self:
+            return
+        index = fighter.store_index
+        fighter.detached_stats = {column: int(getattr(self, column)[index]) for column in STAT_COLUMNS}
+        fighter.store = None
+        fighter.store_index = -1
+        self.alive[index] = False
+        self.in_use[index] = False
+        self.actors[index] = None
+        self._free.append(index)
+        self.rehash(index)
+
+    def move(self, actor) -> None:
+        index = actor.fighter.store_index
+        self.x[index], self.y[index] = actor.location
+        self.rehash(index)
+
+    def mark_dead(self, index: int) -> None:
+        self.alive[index] = False
+        self.rehash(index)
+
+    def rehash(self, index: int) -> None:
+        """Update `state_hash` after the position, HP or alive flag in row `index` changed."""
+        row_hash = 0
+        if self.in_use[index]:
+            row_hash = values_hash(
+                int(self.x[index]), int(self.y[index]), int(self.hp[index]), int(self.alive[index])
+            )
+        self.state_hash = (self.state_hash + row_hash - self._row_hashes[index]) % HASH_MODULUS
+        self._row_hashes[index] = row_hash
+
+    def _grow(self) -> None:
+        old_capacity = len(self.actors)
+        for column in STAT_COLUMNS + POSITION_COLUMNS + ("alive", "in_use"):
+            old = getattr(self, column)
+            setattr(self, column, np.concatenate([old, np.zeros_like(old)]))
+        self.actors.extend([None] * old_capacity)
+        self._row_hashes.extend([0] * old_capacity)
+        self._free.extend(range(2 * old_capacity - 1, old_capacity - 1, -1))
+
+    def living_indices(self) -> np.ndarray:
+        """Return the rows of every living actor, in ascending order."""
+        return self.alive.nonzero()[0]
+
+    def apply_damage(self, indices: np.ndarray, amount: int) -> None:
+        """Damage every actor in `indices` at once, then let those who reached 0 HP die."""
+        self.hp[indices] = np.clip(self.hp[indices] - amount, 0, self.max_hp[indices])
+        for index in indices.tolist():
+            self.rehash(index)
+        for index in indices[(self.hp[indices] == 0) & self.alive[indices]]:
+            actor = self.actors[index]
+            if actor.ai:
+                actor.fighter.die()
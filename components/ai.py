@@ -6,37 +6,79 @@ from typing import List, Optional, Tuple
 import numpy as np  # type: ignore
 import tcod
 from actions import Action, BumpAction, MeleeAction, MovementAction, WaitAction
+from map_objects.coords import Coords
+
+# How far past the activation radius the shared distance map reaches, so monsters chasing the
+# player can still find their way around walls.
+DISTANCE_MAP_MARGIN = 8
+
+
+def movement_cost(gamemap, window: Tuple[slice, slice]) -> np.ndarray:
+    """Return the cost array used for monster pathfinding on `window` of `gamemap`."""
+    # Copy the walkable array.
+    cost = np.array(gamemap.tiles["walkable"][window], dtype=np.int8)
+
+    left, top = window[0].start, window[1].start
+    # Only living actors block movement.
+    for entity, location in gamemap.actor_grid.query_rect(left, top, window[0].stop, window[1].stop):
+        location = (location.x - left, location.y - top)
+        # Check that an enitiy blocks movement and the cost isn't zero (blocking.)
+        if entity.blocks_movement and cost[location]:
+            # Add to the cost of a blocked position.
+            # A lower number means more enemies will crowd behind each other in
+            # hallways.  A higher number means enemies will take longer paths in
+            # order to surround the player.
+            cost[location] += 10
+
+    return cost
+
+
+def player_distance_map(gamemap, player) -> Tuple[np.ndarray, Tuple[int, int]]:
+    """Return a Dijkstra distance map rooted at the player, and the map position of its origin.
+
+    Every monster chasing the player can walk downhill on the same map, so it
+    only has to be computed once per turn.
+    Only monsters near the player use it, so it only covers the area within
+    the schedulers activation radius of the player plus a margin, however large the map is.
+    """
+    padding = gamemap.scheduler.activation_radius + DISTANCE_MAP_MARGIN
+    window = gamemap.pathfinding_window(player.location, padding=padding)
+    left, top = window[0].start, window[1].start
+    cost = movement_cost(gamemap, window)
+    distance = tcod.path.maxarray(cost.shape, dtype=np.int32, order="F")
+    distance[player.location.x - left, player.location.y - top] = 0
+    tcod.path.dijkstra2d(distance, cost, cardinal=2, diagonal=3, out=distance)
+    return distance, (left, top)
+
 
 class BaseAI(Action):
     
     def perform(self) -> None:
         raise NotImplementedError()
 
+    def is_idle(self) -> bool:
+        """Return True if performing would do nothing, so the actor can be parked while far away."""
+        return False
+
     def get_path_to(self, dest) -> List[Tuple[int, int]]:
         """Compute and return a path to the target position.
 
         If there is no valid path then returns an empty list.
         """
-        # Copy the walkable array.
-        cost = np.array(self.entity.gamemap.tiles["walkable"], dtype=np.int8)
-
-        for entity in self.entity.gamemap.entities:
-            # Check that an enitiy blocks movement and the cost isn't zero (blocking.)
-            if entity.blocks_movement and cost[entity.location.x, entity.location.y]:
-                # Add to the cost of a blocked position.
-                # A lower number means more enemies will crowd behind each other in
-                # hallways.  A higher number means enemies will take longer paths in
-                # order to surround the player.
-                cost[entity.location.x, entity.location.y] += 10
+        gamemap = self.entity.gamemap
+        start = self.entity.location
+        window = gamemap.pathfinding_window(start, Coords.from_tuple(dest))
+        left, top = window[0].start, window[1].start
+        cost = movement_cost(gamemap, window)
 
         # Create a graph from the cost array and pass that graph to a new pathfinder.
         graph = tcod.path.SimpleGraph(cost=cost, cardinal=2, diagonal=3)
         pathfinder = tcod.path.Pathfinder(graph)
 
-        pathfinder.add_root((self.entity.location.x, self.entity.location.y))  # Start position.
+        pathfinder.add_root((start.x - left, start.y - top))  # Start position.
 
         # Compute the path to the destination and remove the starting point.
-        path: List[List[int]] = pathfinder.path_to((dest.x, dest.y))[1:].tolist()
+        path: List[List[int]] = (pathfinder.path_to((dest[0] - left, dest[1] - top))[1:] + (left, top)).tolist()
 
         # Convert from List[List[int]] to List[Tuple[int, int]].
         return [(index[0], index[1]) for index in path]
@@ -49,15 +91,14 @@ class HostileEnemy(BaseAI):
     def perform(self) -> None:
         target = self.engine.player
 
-        dx = target.location.x - self.entity.location.x
-        dy = target.location.y - self.entity.location.y
+        dx, dy = target.location - self.entity.location
         
         distance = self.entity.location.chebyshev_distance(target.location)
         if self.engine.game_map.is_visible(self.entity.location):
             if distance <= 1:
                 return MeleeAction(self.entity, dx, dy).perform()
 
-            self.path = self.get_path_to(target.location)
+            self.path = self.get_path_to_player()
 
         if self.path:
             dest_x, dest_y = self.path.pop(0)
@@ -67,19 +108,43 @@ class HostileEnemy(BaseAI):
 
         return WaitAction(self.entity).perform()
 
+    def is_idle(self) -> bool:
+        """An enemy which can't see the player and has nowhere to go only waits."""
+        return not self.path and not self.engine.game_map.is_visible(self.entity.location)
+
+    def get_path_to_player(self) -> List[Tuple[int, int]]:
+        """Return a path to the player by walking downhill on the engines shared distance map.
+
+        If there is no valid path then returns an empty list.
+        """
+        distance, (left, top) = self.engine.player_distance_map
+        start = (self.entity.location.x - left, self.entity.location.y - top)
+        if not (0 <= start[0] < distance.shape[0] and 0 <= start[1] < distance.shape[1]):
+            return []  # Too far from the player to look for a path.
+        if distance[start] == np.iinfo(distance.dtype).max:
+            return []  # The player can't be reached from here.
+
+        path: List[List[int]] = (tcod.path.hillclimb2d(
+            distance, start, cardinal=True, diagonal=True
+        )[1:] + (left, top)).tolist()
+
+        return [(index[0], index[1]) for index in path]
+
 class ConfusedEnemy(BaseAI):
     """
     A confused enemy will stumble around aimlessly for a given number of turns, then revert back to its previous AI.
     If an actor occupies a tile it is randomly moving into, it will attack.
+    Directions are drawn from `rng`, normally the engines random stream.
     """
 
     def __init__(
-        self, entity, previous_ai: Optional[any], turns_remaining: int
+        self, entity, previous_ai: Optional[any], turns_remaining: int, rng: random.Random
     ):
         super().__init__(entity)
 
         self.previous_ai = previous_ai
         self.turns_remaining = turns_remaining
+        self.rng = rng
 
     def perform(self) -> None:
         # Revert the AI back to the original state if the effect has run its course.
@@ -90,7 +155,7 @@ class ConfusedEnemy(BaseAI):
             self.entity.ai = self.previous_ai
         else:
             # Pick a random direction
-            direction_x, direction_y = random.choice(
+            direction_x, direction_y = self.rng.choice(
                 [
                     (-1, -1),  # Northwest
                     (0, -1),  # North
@@ -1,7 +1,7 @@
 from typing import Optional
 
-from map_objects.coords import Coords
 from components.base_component import BaseComponent
+from map_objects.coords import Coords
 import actions
 import color
 from exceptions import Impossible
@@ -56,15 +56,16 @@ class LightningDamageConsumable(Consumable):
     def activate(self, action: actions.ItemAction) -> None:
         consumer = action.entity
         target = None
-        closest_distance = self.maximum_range + 1.0
-
-        for actor in self.engine.game_map.actors:
-            if actor is not consumer and self.parent.gamemap.is_visible(actor.location):
-                distance = consumer.location.distance(actor.location)
+        maximum_distance = self.maximum_range + 1.0
 
-                if distance < closest_distance:
-                    target = actor
-                    closest_distance = distance
+        nearest = self.engine.game_map.get_nearest_actors(
+            consumer.location,
+            max_range=maximum_distance,
+            visible_only=True,
+            predicate=lambda actor: actor is not consumer,
+        )
+        if nearest and consumer.location.distance(nearest[0].location) < maximum_distance:
+            target = nearest[0]
 
         if target:
             self.engine.message_log.add_message(
@@ -105,7 +106,10 @@ class ConfusionConsumable(Consumable):
             color.status_effect_applied,
         )
         target.ai = components.ai.ConfusedEnemy(
-            entity=target, previous_ai=target.ai, turns_remaining=self.number_of_turns,
+            entity=target,
+            previous_ai=target.ai,
+            turns_remaining=self.number_of_turns,
+            rng=self.engine.rng,
         )
         self.consume()
         
@@ -131,15 +135,16 @@ class FireballDamageConsumable(Consumable):
         if not self.engine.game_map.visible_array[target_xy]:
             raise Impossible("You cannot target an area that you cannot see.")
 
-        targets_hit = False
-        for actor in self.engine.game_map.actors:
-            if actor.location.distance(Coords(*target_xy)) <= self.radius:
-                self.engine.message_log.add_message(
-                    f"The {actor.name} is engulfed in a fiery explosion, taking {self.damage} damage!"
-                )
-                actor.fighter.take_damage(self.damage)
-                targets_hit = True
-
-        if not targets_hit:
+        targets = self.engine.game_map.get_actors_in_radius(
+            Coords.from_tuple(target_xy), self.radius
+        )
+        if not targets:
             raise Impossible("There are no targets in the radius.")
+
+        self.engine.game_map.scheduler.make_noise(Coords.from_tuple(target_xy), self.radius * 4)
+        for actor in targets:
+            self.engine.message_log.add_message(
+                f"The {actor.name} is engulfed in a fiery explosion, taking {self.damage} damage!"
+            )
+        self.engine.game_map.damage_actors(targets, self.damage)
         self.consume()
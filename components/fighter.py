@@ -1,3 +1,4 @@
+from components.actor_store import StoredStat
 from components.base_component import BaseComponent
 from input_handlers import GameOverEventHandler
 from map_objects.render_order import RenderOrder
@@ -6,13 +7,18 @@ import color
 
 
 class Fighter(BaseComponent):
+    """Combat stats of an actor, stored in the `ActorStore` of its map while it is on one."""
     parent: any
 
+    max_hp = StoredStat("max_hp")
+    _hp = StoredStat("hp")
+    defense = StoredStat("defense")
+    power = StoredStat("power")
+
     def __init__(self, hp: int, defense: int, power: int):
-        self.max_hp = hp
-        self._hp = hp
-        self.defense = defense
-        self.power = power
+        self.store = None
+        self.store_index = -1
+        self.detached_stats = {"hp": hp, "max_hp": hp, "defense": defense, "power": power}
 
     @property
     def hp(self) -> int:
@@ -58,5 +64,6 @@ class Fighter(BaseComponent):
         self.parent.ai = None
         self.parent.name = f"remains of {self.parent.name}"
         self.parent.render_order = RenderOrder.CORPSE
+        self.gamemap.actor_died(self.parent)
 
         self.engine.message_log.add_message(death_message, death_message_color)
\ No newline at end of file
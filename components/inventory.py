@@ -16,6 +16,6 @@ class Inventory(BaseComponent):
         Removes an item from the inventory and restores it to the game map, at the player's current location.
         """
         self.items.remove(item)
-        item.place(self.parent.x, self.parent.y, self.gamemap)
+        item.place(self.parent.location, self.gamemap)
 
         self.engine.message_log.add_message(f"You dropped the {item.name}.")
\ No newline at end of file
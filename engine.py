@@ -1,25 +1,53 @@
 from tcod.console import Console
 from tcod.map import compute_fov
 
+from components.ai import player_distance_map
 from input_handlers import EventHandler, MainGameEventHandler
-from render_functions import render_bar, render_names_at_mouse_location
+from instrumentation import PhaseTimings
+from map_objects.camera import Camera
+from render_functions import render_bar, render_names_at_mouse_location, render_timings
 from message_log import MessageLog
-import exceptions
+from seeding import rng_for
+
+FOV_RADIUS = 8
+
+# The size of the map view at the top of the console, the rows below it hold the UI.
+MAP_VIEW_WIDTH = 80
+MAP_VIEW_HEIGHT = 43
 
 class Engine:
 
     game_map = None
 
-    def __init__(self, player):
+    def __init__(self, player, seed: int = 0):
         self.event_handler: EventHandler = MainGameEventHandler(self)
         self.player = player
+        # Levels are generated from their own streams, see `seeding.level_rng`.
+        self.seed = seed
+        self.rng = rng_for(seed, "engine")
         self.message_log = MessageLog()
-        self.mouse_location = (0, 0)
+        self.mouse_location = (0, 0)  # On the map, not on the console.
+        # The part of the map on screen, it follows the player.
+        self.camera = Camera(MAP_VIEW_WIDTH, MAP_VIEW_HEIGHT)
+        self._player_distance_map = None
+        self.fov_radius = FOV_RADIUS
+        # What the last FOV computation depended on, and the window of the map it wrote to.
+        self._fov_state = None
+        self._fov_window = None
+        # How long each phase of the turns and frames took, shown on screen while `show_timings` is set.
+        self.timings = PhaseTimings()
+        self.show_timings = False
+        # Player turns taken so far, and the recorder of the players actions if there is one.
+        self.turn = 0
+        self.recorder = None
 
     def render(self, console: Console) -> None:
-        self.game_map.render(console)
+        with self.timings.phase("render.map"):
+            self.camera.follow(self.player.location, self.game_map.width, self.game_map.height)
+            self.game_map.render(console, self.camera)
 
-        self.message_log.render(console=console, x=21, y=45, width=40, height=5)
+        with self.timings.phase("render.messages"):
+            self.message_log.render(console=console, x=21, y=45, width=40, height=5)
 
         render_bar(
             console=console,
@@ -29,21 +57,59 @@ class Engine:
         )
 
         render_names_at_mouse_location(console=console, x=21, y=44, engine=self)
+
+        if self.show_timings:
+            render_timings(console=console, x=0, y=0, timings=self.timings)
         
     def update_fov(self) -> None:
-        """Recompute the visible area based on the players point of view."""
-        self.game_map.visible_array[:] = compute_fov(
-            self.game_map.tiles["transparent"],
-            (self.player.location.x, self.player.location.y),
-            radius=8,
+        """Recompute the visible area based on the players point of view.
+
+        Nothing is done if the map, its transparency, the players position and the sight
+        radius are all unchanged since the last call.
+        Otherwise only the window within the sight radius around the player is computed.
+        """
+        game_map = self.game_map
+        location = self.player.location
+        radius = self.fov_radius
+        state = (game_map, game_map.tiles_version, location, radius)
+        if state == self._fov_state:
+            return
+
+        if self._fov_state is not None and self._fov_state[0] is game_map:
+            game_map.visible_array[self._fov_window] = False
+            game_map.mark_dirty(self._fov_window)
+        else:
+            game_map.visible_array[:] = False
+            game_map.mark_dirty()
+
+        left, top = max(0, location.x - radius), max(0, location.y - radius)
+        window = slice(left, location.x + radius + 1), slice(top, location.y + radius + 1)
+        visible = compute_fov(
+            game_map.tiles["transparent"][window],
+            (location.x - left, location.y - top),
+            radius=radius,
         )
+        game_map.visible_array[window] = visible
         # If a tile is "visible" it should be added to "explored".
-        self.game_map.explored |= self.game_map.visible_array
+        explored = game_map.explored[window]
+        if (visible & ~explored).any():
+            game_map.explored[window] = explored | visible
+            game_map.mark_explored(window)
+        game_map.mark_dirty(window)
+
+        self._fov_state = state
+        self._fov_window = window
+
+    @property
+    def player_distance_map(self):
+        """A distance map rooted at the player and the map position of its origin, shared by
+        every monster for the current turn."""
+        if self._player_distance_map is None:
+            self._player_distance_map = player_distance_map(self.game_map, self.player)
+        return self._player_distance_map
 
     def handle_enemy_turns(self) -> None:
-        for entity in set(self.game_map.actors) - {self.player}:
-            if entity.ai:
-                try:
-                    entity.ai.perform()
-                except exceptions.Impossible:
-                    pass  # Ignore impossible action exceptions from AI
\ No newline at end of file
+        """Let the monsters act until the players next turn, only awake monsters cost any time."""
+        self._player_distance_map = None  # The player may have moved since the last turn.
+        with self.timings.phase("enemy_turns"):
+            self.game_map.scheduler.run_turn()
\ No newline at end of file
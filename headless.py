@@ -0,0 +1,114 @@
+"""Drive the engine without a window, for load testing AI and map code on machines without a display.
+
+Example:
+    python headless.py --turns 5000 --seed 42
+"""
+import argparse
+import random
+import time
+from typing import Iterable, Iterator, Optional, Union
+
+import tcod
+
+from actions import Action
+from engine import Engine
+from input_handlers import MOVE_KEYS, WAIT_KEYS
+from map_objects.level_store import LevelStore
+from setup_game import SCREEN_HEIGHT, SCREEN_WIDTH, new_engine
+
+
+class HeadlessResult:
+    def __init__(self, inputs: int, turns: int, elapsed: float):
+        self.inputs = inputs
+        self.turns = turns
+        self.elapsed = elapsed
+
+    @property
+    def turns_per_second(self) -> float:
+        if self.elapsed <= 0:
+            return 0.0
+        return self.turns / self.elapsed
+
+    def __str__(self) -> str:
+        return (
+            f"{self.turns} turns from {self.inputs} inputs in {self.elapsed:.3f}s "
+            f"({self.turns_per_second:.1f} turns/s)"
+        )
+
+
+def run_headless(
+    engine: Engine,
+    inputs: Iterable[Union[Action, tcod.event.Event]],
+    console: Optional[tcod.Console] = None,
+) -> HeadlessResult:
+    """Feed `inputs` to the engine as fast as possible.
+
+    Each input is either an `Action`, which is handled by the current event handler, or a
+    `tcod.event.Event`, which is dispatched to it as if it came from a window.
+    If `console` is given then the game is rendered to it after every input, otherwise
+    nothing is rendered.
+    The run stops early when the inputs run out, the player dies or the game asks to quit.
+    """
+    input_count = 0
+    turns = 0
+    start = time.perf_counter()
+    try:
+        for game_input in inputs:
+            if not engine.player.is_alive:
+                break
+            input_count += 1
+            if isinstance(game_input, Action):
+                advanced = engine.event_handler.handle_action(game_input)
+            else:
+                advanced = engine.event_handler.handle_events(game_input)
+            if advanced:
+                turns += 1
+            if console is not None:
+                console.clear()
+                engine.event_handler.on_render(console=console)
+    except SystemExit:
+        pass  # The game asked to quit, e.g. from an escape key event.
+    return HeadlessResult(input_count, turns, time.perf_counter() - start)
+
+
+def random_walk(count: int, rng: random.Random) -> Iterator[tcod.event.KeyDown]:
+    """Yield `count` key presses which wander around the map, occasionally waiting."""
+    keys = list(MOVE_KEYS) + list(WAIT_KEYS)
+    for _ in range(count):
+        yield tcod.event.KeyDown(0, rng.choice(keys), tcod.event.KMOD_NONE)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=1000, help="number of key presses to send")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--map-width", type=int, default=80)
+    parser.add_argument("--map-height", type=int, default=43)
+    parser.add_argument("--max-rooms", type=int, default=30)
+    parser.add_argument("--max-monsters-per-room", type=int, default=2)
+    parser.add_argument("--render", action="store_true", help="render every input to an offscreen console")
+    parser.add_argument("--level-store", metavar="DIRECTORY", help="load the level from, or save it to, this level store")
+    parser.add_argument("--timings", metavar="PATH", help="write the phase timings to this .csv or .jsonl file")
+    args = parser.parse_args()
+
+    engine = new_engine(
+        seed=args.seed,
+        map_width=args.map_width,
+        map_height=args.map_height,
+        max_rooms=args.max_rooms,
+        max_monsters_per_room=args.max_monsters_per_room,
+        level_store=LevelStore(args.level_store) if args.level_store else None,
+    )
+    console = None
+    if args.render:
+        # The camera follows the player, so maps of any size render to a screen sized console.
+        console = tcod.Console(SCREEN_WIDTH, SCREEN_HEIGHT, order="F")
+
+    result = run_headless(engine, random_walk(args.turns, random.Random(args.seed)), console)
+    print(result)
+    if args.timings:
+        engine.timings.dump(args.timings)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,8 @@
-from typing import Callable, Optional, Tuple
+from typing import Callable, Iterable, List, Optional, Tuple
 import tcod
 
 import actions
 from actions import Action, BumpAction, WaitAction, PickupAction
-from map_objects.coords import Coords
 import exceptions
 import color
 
@@ -55,12 +54,40 @@ CONFIRM_KEYS = {
     tcod.event.K_KP_ENTER,
 }
 
+# Events no handler reacts to, so they never require a redraw.
+IGNORED_EVENT_TYPES = (tcod.event.KeyUp, tcod.event.TextInput, tcod.event.MouseButtonUp)
+
+
+def coalesce_mouse_motion(events: Iterable[tcod.event.Event]) -> List[tcod.event.Event]:
+    """Return the events with each run of consecutive mouse motions reduced to its last one.
+
+    Only the final position of a run matters, any other event in between is kept in order.
+    """
+    coalesced: List[tcod.event.Event] = []
+    for event in events:
+        if (
+            isinstance(event, tcod.event.MouseMotion)
+            and coalesced
+            and isinstance(coalesced[-1], tcod.event.MouseMotion)
+        ):
+            coalesced[-1] = event
+        else:
+            coalesced.append(event)
+    return coalesced
+
+
 class EventHandler(tcod.event.EventDispatch[any]):
     def __init__(self, engine):
         self.engine = engine
 
-    def handle_events(self, event: tcod.event.Event) -> None:
-        self.handle_action(self.dispatch(event))
+    def handle_events(self, event: tcod.event.Event) -> bool:
+        """Dispatch an event and handle the resulting action.
+
+        Returns True if the event advanced a turn.
+        """
+        with self.engine.timings.phase("dispatch"):
+            action = self.dispatch(event)
+        return self.handle_action(action)
 
     def handle_action(self, action: Optional[Action]) -> bool:
         """Handle actions returned from event methods.
@@ -69,21 +96,30 @@ class EventHandler(tcod.event.EventDispatch[any]):
         """
         if action is None:
             return False
+        if self.engine.recorder is not None:
+            self.engine.recorder.record(self.engine, action)
 
+        timings = self.engine.timings
         try:
-            action.perform()
+            with timings.phase("action"):
+                action.perform()
         except exceptions.Impossible as exc:
             self.engine.message_log.add_message(exc.args[0], color.impossible)
             return False  # Skip enemy turn on exceptions.
 
         self.engine.handle_enemy_turns()
 
-        self.engine.update_fov()
+        with timings.phase("fov"):
+            self.engine.update_fov()
+        self.engine.turn += 1
+        if self.engine.recorder is not None:
+            self.engine.recorder.record_checksum(self.engine)
         return True
 
     def ev_mousemotion(self, event: tcod.event.MouseMotion) -> None:
-        if self.engine.game_map.is_in_bounds(Coords(event.tile.x, event.tile.y)):
-            self.engine.mouse_location = event.tile.x, event.tile.y
+        location = self.engine.camera.to_map(*event.tile)
+        if location is not None and self.engine.game_map.is_in_bounds(location):
+            self.engine.mouse_location = location
 
     def ev_quit(self, event: tcod.event.Quit):
         raise SystemExit()
@@ -103,6 +139,8 @@ class MainGameEventHandler(EventHandler):
             return BumpAction(player, dx, dy)
         elif key in WAIT_KEYS:
             return WaitAction(player)
+        elif key == tcod.event.K_F3:
+            self.engine.show_timings = not self.engine.show_timings
         elif key == tcod.event.K_v:
             self.engine.event_handler = HistoryViewer(self.engine)
         elif key == tcod.event.K_g:
@@ -160,7 +198,8 @@ class HistoryViewer(EventHandler):
             1,
             log_console.width - 2,
             log_console.height - 2,
-            self.engine.message_log.messages[: self.cursor + 1],
+            self.engine.message_log.messages,
+            end=self.cursor + 1,
         )
         log_console.blit(console, 3, 3)
 
@@ -315,12 +354,12 @@ class SelectIndexHandler(AskUserEventHandler):
         """Sets the cursor to the player when this handler is constructed."""
         super().__init__(engine)
         player = self.engine.player
-        engine.mouse_location = player.location.x, player.location.y
+        engine.mouse_location = player.location
 
     def on_render(self, console: tcod.Console) -> None:
         """Highlight the tile under the cursor."""
         super().on_render(console)
-        x, y = self.engine.mouse_location
+        x, y = self.engine.camera.to_console(self.engine.mouse_location)
         console.tiles_rgb["bg"][x, y] = color.white
         console.tiles_rgb["fg"][x, y] = color.black
 
@@ -340,9 +379,10 @@ class SelectIndexHandler(AskUserEventHandler):
             dx, dy = MOVE_KEYS[key]
             x += dx * modifier
             y += dy * modifier
-            # Clamp the cursor index to the map size.
-            x = max(0, min(x, self.engine.game_map.width - 1))
-            y = max(0, min(y, self.engine.game_map.height - 1))
+            # Clamp the cursor index to the part of the map in view.
+            view_x, view_y = self.engine.camera.window(self.engine.game_map.width, self.engine.game_map.height)
+            x = max(view_x.start, min(x, view_x.stop - 1))
+            y = max(view_y.start, min(y, view_y.stop - 1))
             self.engine.mouse_location = x, y
             return None
         elif key in CONFIRM_KEYS:
@@ -351,9 +391,10 @@ class SelectIndexHandler(AskUserEventHandler):
 
     def ev_mousebuttondown(self, event: tcod.event.MouseButtonDown) -> Optional[Action]:
         """Left click confirms a selection."""
-        if self.engine.game_map.is_in_bounds(Coords(*event.tile)):
+        location = self.engine.camera.to_map(*event.tile)
+        if location is not None and self.engine.game_map.is_in_bounds(location):
             if event.button == 1:
-                return self.on_index_selected(*event.tile)
+                return self.on_index_selected(*location)
         return super().ev_mousebuttondown(event)
 
     def on_index_selected(self, x: int, y: int) -> Optional[Action]:
@@ -399,7 +440,7 @@ class AreaRangedAttackHandler(SelectIndexHandler):
         """Highlight the tile under the cursor."""
         super().on_render(console)
 
-        x, y = self.engine.mouse_location
+        x, y = self.engine.camera.to_console(self.engine.mouse_location)
 
         # Draw a rectangle around the targeted area, so the player can see the affected tiles.
         console.draw_frame(
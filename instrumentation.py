@@ -0,0 +1,110 @@
+"""Timing counters for the phases of a turn and a frame, to find out where the time goes."""
+import csv
+import json
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, Iterator, List, Sequence
+
+# How many of the latest samples each phase keeps for its percentiles.
+WINDOW = 512
+PERCENTILES = (50, 90, 99)
+
+
+class PhaseStats:
+    """Durations of one phase, the latest `window` of them kept for rolling percentiles."""
+
+    def __init__(self, name: str, window: int = WINDOW):
+        self.name = name
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def percentiles(self, percents: Sequence[int] = PERCENTILES) -> List[float]:
+        """Return the given percentiles of the recent samples in seconds, nearest rank."""
+        if not self.samples:
+            return [0.0] * len(percents)
+        ordered = sorted(self.samples)
+        # The smallest sample with at least `percent` percent of the samples at or below it.
+        return [ordered[max(0, math.ceil(percent * len(ordered) / 100) - 1)] for percent in percents]
+
+    def summary(self) -> Dict:
+        """Return the counters of this phase, with durations in milliseconds."""
+        row = {
+            "phase": self.name,
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "last_ms": self.samples[-1] * 1000 if self.samples else 0.0,
+        }
+        for percent, value in zip(PERCENTILES, self.percentiles()):
+            row[f"p{percent}_ms"] = value * 1000
+        row["max_ms"] = max(self.samples, default=0.0) * 1000
+        return row
+
+
+class _PhaseTimer:
+    """Context manager adding the time spent inside it to a phase, reused between calls."""
+
+    def __init__(self, stats: PhaseStats):
+        self.stats = stats
+        self.start = 0.0
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stats.add(time.perf_counter() - self.start)
+
+
+class PhaseTimings:
+    """Rolling timings of named phases, e.g. `with timings.phase("fov"): ...`."""
+
+    def __init__(self, window: int = WINDOW):
+        self.window = window
+        self._stats: Dict[str, PhaseStats] = {}
+        self._timers: Dict[str, _PhaseTimer] = {}
+
+    def stats(self, name: str) -> PhaseStats:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = PhaseStats(name, self.window)
+        return stats
+
+    def phase(self, name: str) -> _PhaseTimer:
+        """Return a context manager timing the code run inside it as `name`."""
+        timer = self._timers.get(name)
+        if timer is None:
+            timer = self._timers[name] = _PhaseTimer(self.stats(name))
+        return timer
+
+    def record(self, name: str, seconds: float) -> None:
+        """Add a duration measured elsewhere, for hot loops where a context manager costs too much."""
+        self.stats(name).add(seconds)
+
+    def __iter__(self) -> Iterator[PhaseStats]:
+        """Iterate over the phases sorted by name."""
+        return iter(sorted(self._stats.values(), key=lambda stats: stats.name))
+
+    def summary(self) -> List[Dict]:
+        return [stats.summary() for stats in self]
+
+    def reset(self) -> None:
+        self._stats.clear()
+        self._timers.clear()
+
+    def dump(self, path: str) -> None:
+        """Write the summary of every phase to `path`, as CSV if it ends in .csv and JSON lines otherwise."""
+        rows = self.summary()
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            if path.endswith(".csv"):
+                if rows:
+                    writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+                    writer.writeheader()
+                    writer.writerows(rows)
+            else:
+                file.writelines(json.dumps(row) + "\n" for row in rows)
@@ -1,73 +1,114 @@
-import copy
+import argparse
+import os
 import traceback
+from typing import Optional
 
 import tcod
 
 from engine import Engine
-from map_objects import entity_factories
-from map_objects.procedual_generator import generate_dungeon
+from map_objects.level_store import LevelStore
+from savegame import load_game, save_game
+from seeding import new_run_seed
+from input_handlers import IGNORED_EVENT_TYPES, coalesce_mouse_motion
+from replay import new_recorded_engine
+from setup_game import SCREEN_HEIGHT, SCREEN_WIDTH
 import color
 FONT_FILE = "arial10x10.png"
 
+# Where generated levels are kept, so a known level loads without generating it again.
+LEVEL_STORE_DIRECTORY = "level_store"
+
+SAVE_FILE = "savegame.npz"
+# The game is saved every this many turns, and when the window is closed.
+AUTOSAVE_TURNS = 10
+
+# New games record their actions here, in a file named after the seed, see `replay`.
+REPLAY_DIRECTORY = "replays"
+
+# The phase timings of the session are written here on exit, see `instrumentation`.
+TIMINGS_FILE = "timings.csv"
+
+
+def continue_or_new_engine(seed: Optional[int] = None) -> Engine:
+    """Return the saved game if there is one and the player is still alive, otherwise a new game.
+
+    If `seed` is given a new game with that seed is started instead. Its levels are kept in
+    the level store, since a known seed is the only way a stored level is ever asked for again.
+    """
+    if seed is not None:
+        return new_recorded_engine(
+            os.path.join(REPLAY_DIRECTORY, f"{seed}.jsonl"),
+            seed=seed,
+            level_store=LevelStore(LEVEL_STORE_DIRECTORY),
+        )
+    if os.path.exists(SAVE_FILE):
+        try:
+            engine = load_game(SAVE_FILE)
+        except Exception:
+            traceback.print_exc()  # A broken save shouldn't stop a new game from starting.
+        else:
+            if engine.player.is_alive:
+                return engine
+    seed = new_run_seed()
+    return new_recorded_engine(os.path.join(REPLAY_DIRECTORY, f"{seed}.jsonl"), seed=seed)
+
+
 def main() -> bool:
-    screen_width = 80
-    screen_height = 50
-    
-    map_width: int = 80
-    map_height: int = 43
-    
-    room_max_size = 10
-    room_min_size = 6
-    max_rooms = 30
-
-    max_monsters_per_room=2
-    max_items_per_room = 2
+    parser = argparse.ArgumentParser(description="A simple rogue-like.")
+    parser.add_argument("--seed", type=int, help="start a new game with this seed instead of continuing the saved one")
+    args = parser.parse_args()
 
     tileset = tcod.tileset.load_tilesheet(
         FONT_FILE, 32, 8, tcod.tileset.CHARMAP_TCOD
     )
-    
-    player = copy.deepcopy(entity_factories.player)
-
-    engine = Engine(player=player)
-
-    engine.game_map =  generate_dungeon(
-        max_rooms=max_rooms,
-        room_min_size=room_min_size,
-        room_max_size=room_max_size,
-        map_width=map_width,
-        map_height=map_height,
-        max_monsters_per_room=max_monsters_per_room,
-        max_items_per_room=max_items_per_room,
-        engine=engine,
-    )
 
-    engine.update_fov()
-    engine.message_log.add_message(
-        "Hello and welcome, adventurer, to yet another dungeon!", color.welcome_text
-    )
+    engine = continue_or_new_engine(args.seed)
+    turns_since_save = 0
 
     with tcod.context.new_terminal(
-        screen_width,
-        screen_height,
+        SCREEN_WIDTH,
+        SCREEN_HEIGHT,
         tileset=tileset,
         title="Roguelike",
         vsync=True,
     ) as context:
-        root_console: tcod.Console = tcod.Console(screen_width, screen_height, order="F")
-        while True:
-            root_console.clear()
-            engine.event_handler.on_render(console=root_console)
-            context.present(root_console)
-
-            try:
-                for event in tcod.event.wait():
-                    context.convert_event(event)
-                    engine.event_handler.handle_events(event)
-            except Exception:  # Handle exceptions in game.
-                traceback.print_exc()  # Print error to stderr.
-                # Then print the error to the message log.
-                engine.message_log.add_message(traceback.format_exc(), color.error)
+        root_console: tcod.Console = tcod.Console(SCREEN_WIDTH, SCREEN_HEIGHT, order="F")
+        # Rendering only happens when something visible changed, once per batch of events.
+        dirty = True
+        try:
+            while True:
+                if dirty:
+                    root_console.clear()
+                    engine.event_handler.on_render(console=root_console)
+                    context.present(root_console)
+                    dirty = False
+
+                try:
+                    for event in coalesce_mouse_motion(tcod.event.wait()):
+                        context.convert_event(event)
+                        if isinstance(event, tcod.event.MouseMotion):
+                            # Moving within the same tile changes nothing on screen.
+                            mouse_location = engine.mouse_location
+                            engine.event_handler.handle_events(event)
+                            dirty = dirty or engine.mouse_location != mouse_location
+                            continue
+                        if not isinstance(event, IGNORED_EVENT_TYPES):
+                            dirty = True
+                        if engine.event_handler.handle_events(event):
+                            turns_since_save += 1
+                except Exception:  # Handle exceptions in game.
+                    traceback.print_exc()  # Print error to stderr.
+                    # Then print the error to the message log.
+                    engine.message_log.add_message(traceback.format_exc(), color.error)
+                    dirty = True
+
+                if turns_since_save >= AUTOSAVE_TURNS:
+                    save_game(engine, SAVE_FILE)
+                    turns_since_save = 0
+        except SystemExit:
+            save_game(engine, SAVE_FILE)
+            engine.timings.dump(TIMINGS_FILE)
+            raise
 
 if __name__ == "__main__":
     main()
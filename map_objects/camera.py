@@ -0,0 +1,37 @@
+from typing import Optional, Tuple
+
+from map_objects.coords import Coords
+
+
+class Camera:
+    """The window of the map that is drawn on the console, from its top left corner.
+
+    `follow` keeps a location in the middle of the view, except near the edges of the map
+    where the view stops scrolling. Maps smaller than the view are drawn from the corner.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.x = 0  # The map position drawn at the top left of the console.
+        self.y = 0
+
+    def follow(self, location: Coords, map_width: int, map_height: int) -> None:
+        self.x = max(0, min(location.x - self.width // 2, map_width - self.width))
+        self.y = max(0, min(location.y - self.height // 2, map_height - self.height))
+
+    def window(self, map_width: int, map_height: int) -> Tuple[slice, slice]:
+        """Return the part of a map of the given size that is in view."""
+        return (
+            slice(self.x, min(map_width, self.x + self.width)),
+            slice(self.y, min(map_height, self.y + self.height)),
+        )
+
+    def to_map(self, x: int, y: int) -> Optional[Coords]:
+        """Return the map position at the console position, or None if that is outside the view."""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return Coords(x + self.x, y + self.y)
+        return None
+
+    def to_console(self, location: Coords) -> Tuple[int, int]:
+        return location[0] - self.x, location[1] - self.y
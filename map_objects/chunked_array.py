@@ -0,0 +1,325 @@
+import hashlib
+import os
+import shutil
+import struct
+import tempfile
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy
+
+CHUNK_SIZE = 64
+# Block hashes, and the other hashes of the state digest, are summed modulo this, so a digest
+# is updated by replacing the hashes of the parts that changed.
+HASH_MODULUS = 1 << 64
+
+ChunkKey = Tuple[int, int]
+
+
+class ChunkedArray:
+    """A 2D array stored as square chunks, for maps too large to keep in memory as one array.
+
+    Chunks are only allocated once something other than `fill` is written to them, until then
+    they read as `fill`. If `max_resident` is given the least recently used chunks beyond that many are
+    evicted to files in a temporary directory, and read back when they are needed again.
+
+    It supports the indexing the game uses on its map arrays: reading or writing one
+    element with an (x, y) pair, reading or writing a window with a pair of slices, and
+    reading one field of a structured array, e.g. `tiles["walkable"][x, y]`.
+    Windows are read as dense Fortran ordered copies, writes to them have to be assigned back.
+    """
+
+    def __init__(
+        self,
+        shape: Tuple[int, int],
+        dtype,
+        fill,
+        chunk_size: int = CHUNK_SIZE,
+        max_resident: Optional[int] = None,
+    ):
+        self.shape = shape
+        self.dtype = numpy.dtype(dtype)
+        self.fill = numpy.array(fill, dtype=self.dtype)
+        self.chunk_size = chunk_size
+        self.max_resident = max_resident
+        self._chunks: "OrderedDict[ChunkKey, numpy.ndarray]" = OrderedDict()  # In least recently used order.
+        self._evicted: Set[ChunkKey] = set()
+        self._changed: Set[ChunkKey] = set()  # Resident chunks which differ from their evicted copy.
+        # The hash of each chunk, their sum, and the chunks written since they were hashed.
+        self._hashes: Dict[ChunkKey, int] = {}
+        self._hash_sum = 0
+        self._unhashed: Set[ChunkKey] = set()
+        self._spill_directory: Optional[str] = None
+
+    def __del__(self):
+        if self._spill_directory is not None:
+            shutil.rmtree(self._spill_directory, ignore_errors=True)
+
+    @property
+    def width(self) -> int:
+        return self.shape[0]
+
+    @property
+    def height(self) -> int:
+        return self.shape[1]
+
+    @property
+    def resident_chunks(self) -> int:
+        return len(self._chunks)
+
+    @property
+    def chunk_count(self) -> int:
+        """The number of allocated chunks, in memory or evicted."""
+        return len(self._chunks.keys() | self._evicted)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return ChunkedField(self, key)
+        first, second = self._split_key(key)
+        if isinstance(first, slice):
+            return self._get_window(first, second)
+        chunk = self._chunk((first // self.chunk_size, second // self.chunk_size), allocate=False)
+        if chunk is None:
+            return self.fill[()]
+        return chunk[first % self.chunk_size, second % self.chunk_size]
+
+    def __setitem__(self, key, value) -> None:
+        first, second = self._split_key(key)
+        if not isinstance(first, slice):
+            chunk_key = (first // self.chunk_size, second // self.chunk_size)
+            chunk = self._chunk(chunk_key, allocate=False)
+            if chunk is None:
+                if self._is_fill(numpy.asarray(value, dtype=self.dtype)):
+                    return  # It already reads as fill.
+                chunk = self._chunk(chunk_key, allocate=True)
+            chunk[first % self.chunk_size, second % self.chunk_size] = value
+            self._touched(chunk_key)
+            return
+        left, right = first.indices(self.width)[:2]
+        top, bottom = second.indices(self.height)[:2]
+        value = numpy.asarray(value, dtype=self.dtype)
+        if (left, top, right, bottom) == (0, 0, self.width, self.height) and value.ndim == 0:
+            self._reset(value)  # Filling everything, so the chunks can go.
+            return
+        value = numpy.broadcast_to(value, (max(0, right - left), max(0, bottom - top)))
+        for chunk_key, (chunk_window, value_window) in self._overlapping(left, top, right, bottom):
+            chunk = self._chunk(chunk_key, allocate=False)
+            if chunk is None:
+                if self._is_fill(value[value_window]):
+                    continue
+                chunk = self._chunk(chunk_key, allocate=True)
+            chunk[chunk_window] = value[value_window]
+            self._touched(chunk_key)
+
+    def __array__(self, dtype=None, copy=None) -> numpy.ndarray:
+        """Return the whole array as one dense array, only sensible for small arrays."""
+        array = self[:, :]
+        return array if dtype is None else array.astype(dtype)
+
+    def iter_chunks(self) -> Iterator[Tuple[ChunkKey, numpy.ndarray]]:
+        """Yield every allocated chunk with its key, in key order, evicted chunks are read without caching them."""
+        for chunk_key in sorted(set(self._chunks) | self._evicted):
+            chunk = self._chunks.get(chunk_key)
+            yield chunk_key, self._read_evicted(chunk_key) if chunk is None else chunk
+
+    def load_chunks(self, keys: numpy.ndarray, chunks: numpy.ndarray) -> None:
+        """Replace the contents with chunks as written by `iter_chunks`."""
+        self._reset(self.fill)
+        for (chunk_x, chunk_y), chunk in zip(keys.tolist(), chunks):
+            chunk_key = (chunk_x, chunk_y)
+            self._chunks[chunk_key] = numpy.asfortranarray(chunk)
+            self._touched(chunk_key)
+            self._evict_excess()
+
+    def digest(self) -> bytes:
+        """Return a hash of the contents, only chunks written since the last call are hashed again.
+
+        Chunks which only hold `fill` are left out, the same as chunks that were never
+        allocated, so equal contents give equal digests whatever was written before.
+        """
+        for chunk_key in self._unhashed:
+            chunk = self._chunks.get(chunk_key)
+            if chunk is None:
+                chunk = self._read_evicted(chunk_key)
+            chunk_hash = 0 if self._is_fill(chunk) else block_hash(chunk_key, chunk)
+            self._hash_sum = (self._hash_sum + chunk_hash - self._hashes.get(chunk_key, 0)) % HASH_MODULUS
+            self._hashes[chunk_key] = chunk_hash
+        self._unhashed.clear()
+        return hashlib.blake2b(self.fill.tobytes() + self._hash_sum.to_bytes(8, "little"), digest_size=8).digest()
+
+    def _is_fill(self, values: numpy.ndarray) -> bool:
+        """Return whether every element of `values` is `fill`, comparing their bytes."""
+        return values.tobytes() == self.fill.tobytes() * values.size
+
+    def _split_key(self, key):
+        if key is Ellipsis or key == slice(None):
+            return slice(None), slice(None)
+        first, second = key
+        if not isinstance(first, slice):
+            first, second = int(first), int(second)
+            if not (0 <= first < self.width and 0 <= second < self.height):
+                raise IndexError(f"Index {(first, second)} is out of bounds for shape {self.shape}.")
+        return first, second
+
+    def _get_window(self, first: slice, second: slice) -> numpy.ndarray:
+        left, right = first.indices(self.width)[:2]
+        top, bottom = second.indices(self.height)[:2]
+        window = numpy.empty((max(0, right - left), max(0, bottom - top)), dtype=self.dtype, order="F")
+        window[...] = self.fill
+        for chunk_key, (chunk_window, value_window) in self._overlapping(left, top, right, bottom):
+            chunk = self._chunk(chunk_key, allocate=False)
+            if chunk is not None:
+                window[value_window] = chunk[chunk_window]
+        return window
+
+    def _overlapping(self, left: int, top: int, right: int, bottom: int):
+        """Yield each chunk key in the window, with the windows of the chunk and of the window they share."""
+        size = self.chunk_size
+        for chunk_x in range(left // size, (right - 1) // size + 1 if right > left else left // size):
+            for chunk_y in range(top // size, (bottom - 1) // size + 1 if bottom > top else top // size):
+                start_x, start_y = max(left, chunk_x * size), max(top, chunk_y * size)
+                stop_x, stop_y = min(right, (chunk_x + 1) * size), min(bottom, (chunk_y + 1) * size)
+                yield (chunk_x, chunk_y), (
+                    (slice(start_x - chunk_x * size, stop_x - chunk_x * size),
+                     slice(start_y - chunk_y * size, stop_y - chunk_y * size)),
+                    (slice(start_x - left, stop_x - left), slice(start_y - top, stop_y - top)),
+                )
+
+    def _chunk(self, chunk_key: ChunkKey, allocate: bool) -> Optional[numpy.ndarray]:
+        chunk = self._chunks.get(chunk_key)
+        if chunk is not None:
+            self._chunks.move_to_end(chunk_key)
+            return chunk
+        if chunk_key in self._evicted:
+            chunk = self._read_evicted(chunk_key)
+        elif allocate:
+            chunk = numpy.empty((self.chunk_size, self.chunk_size), dtype=self.dtype, order="F")
+            chunk[...] = self.fill
+            self._changed.add(chunk_key)
+        else:
+            return None
+        self._chunks[chunk_key] = chunk
+        self._evict_excess(keep=chunk_key)
+        return chunk
+
+    def _touched(self, chunk_key: ChunkKey) -> None:
+        self._changed.add(chunk_key)
+        self._unhashed.add(chunk_key)
+
+    def _reset(self, fill: numpy.ndarray) -> None:
+        self.fill = numpy.array(fill, dtype=self.dtype)
+        self._chunks.clear()
+        self._evicted.clear()
+        self._changed.clear()
+        self._hashes.clear()
+        self._hash_sum = 0
+        self._unhashed.clear()
+
+    def _spill_path(self, chunk_key: ChunkKey) -> str:
+        if self._spill_directory is None:
+            self._spill_directory = tempfile.mkdtemp(prefix="chunks-")
+        return os.path.join(self._spill_directory, f"{chunk_key[0]}_{chunk_key[1]}.npy")
+
+    def _read_evicted(self, chunk_key: ChunkKey) -> numpy.ndarray:
+        return numpy.load(self._spill_path(chunk_key))
+
+    def _evict_excess(self, keep: Optional[ChunkKey] = None) -> None:
+        if self.max_resident is None:
+            return
+        while len(self._chunks) > self.max_resident:
+            chunk_key, chunk = next(iter(self._chunks.items()))
+            if chunk_key == keep:
+                break
+            del self._chunks[chunk_key]
+            if chunk_key in self._changed or chunk_key not in self._evicted:
+                numpy.save(self._spill_path(chunk_key), chunk)
+                self._changed.discard(chunk_key)
+            self._evicted.add(chunk_key)
+
+
+class ChunkedField:
+    """One field of a structured `ChunkedArray`, which can be read like the array itself."""
+
+    def __init__(self, array: ChunkedArray, name: str):
+        self.array = array
+        self.name = name
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.array.shape
+
+    def __getitem__(self, key):
+        return self.array[key][self.name]
+
+    def __setitem__(self, key, value) -> None:
+        """Write the field of an element or a window, by writing them back to the array."""
+        values = numpy.array(self.array[key], dtype=self.array.dtype)
+        values[self.name] = value
+        self.array[key] = values
+
+    def __array__(self, dtype=None, copy=None) -> numpy.ndarray:
+        array = self.array[:, :][self.name]
+        return array if dtype is None else array.astype(dtype)
+
+
+class BlockDigest:
+    """A hash of a dense 2D array kept per `CHUNK_SIZE` block, the way `ChunkedArray.digest` is.
+
+    Pass every region written to the array to `mark_changed`, `digest` only hashes the blocks
+    in those regions again.
+    """
+
+    def __init__(self, width: int, height: int, chunk_size: int = CHUNK_SIZE):
+        self.width = width
+        self.height = height
+        self.chunk_size = chunk_size
+        self._hashes: Dict[ChunkKey, int] = {}
+        self._hash_sum = 0
+        self._unhashed: Set[ChunkKey] = set()
+        self.mark_changed()
+
+    def mark_changed(self, region: Tuple[slice, slice] = (slice(None), slice(None))) -> None:
+        left, right = region[0].indices(self.width)[:2]
+        top, bottom = region[1].indices(self.height)[:2]
+        if left >= right or top >= bottom:
+            return
+        size = self.chunk_size
+        for block_x in range(left // size, (right - 1) // size + 1):
+            for block_y in range(top // size, (bottom - 1) // size + 1):
+                self._unhashed.add((block_x, block_y))
+
+    def digest(self, array: numpy.ndarray) -> bytes:
+        size = self.chunk_size
+        for block_key in self._unhashed:
+            x, y = block_key[0] * size, block_key[1] * size
+            block = array[x:x + size, y:y + size]
+            new_hash = block_hash(block_key, block)
+            self._hash_sum = (self._hash_sum + new_hash - self._hashes.get(block_key, 0)) % HASH_MODULUS
+            self._hashes[block_key] = new_hash
+        self._unhashed.clear()
+        return self._hash_sum.to_bytes(8, "little")
+
+
+def block_hash(key: ChunkKey, block: numpy.ndarray) -> int:
+    """Return a hash of a block of an array and of where it is."""
+    hasher = hashlib.blake2b(numpy.array(key, dtype=numpy.int32).tobytes(), digest_size=8)
+    hasher.update(numpy.ascontiguousarray(block).view(numpy.uint8))
+    return int.from_bytes(hasher.digest(), "little")
+
+
+def values_hash(*values: int, prefix: bytes = b"") -> int:
+    """Return a hash of `prefix` and of `values` packed as little endian int64s.
+
+    Unlike the built in `hash` it is the same for every Python version and machine.
+    """
+    packed = struct.pack(f"<{len(values)}q", *values)
+    return int.from_bytes(hashlib.blake2b(prefix + packed, digest_size=8).digest(), "little")
+
+
+def chunk_windows(width: int, height: int, chunk_size: int = CHUNK_SIZE) -> List[Tuple[slice, slice]]:
+    """Return the windows of a `width` by `height` array which match the chunks of a `ChunkedArray`."""
+    return [
+        (slice(x, min(width, x + chunk_size)), slice(y, min(height, y + chunk_size)))
+        for x in range(0, width, chunk_size)
+        for y in range(0, height, chunk_size)
+    ]
@@ -1,19 +1,30 @@
-from typing import Tuple
+from typing import NamedTuple, Tuple
 import math
 
-class Coords:
-    def __init__(self, x, y) -> None:
-        self.x = x
-        self.y = y
-        
-    def __eq__(self, other):
-        return self.x == other.x and self.y == other.y
-    
+class Coords(NamedTuple):
+    """
+    An immutable map position.
+
+    Being a tuple it is hashable, carries no instance `__dict__` and can index numpy
+    arrays directly, e.g. `tiles[coords]`.
+    """
+    x: int
+    y: int
 
     @classmethod
-    def from_tuple(cls, coords: Tuple[int, int]) -> None:
+    def from_tuple(cls, coords: Tuple[int, int]) -> "Coords":
         return cls(x = coords[0], y = coords[1])
 
+    def __add__(self, other: "Coords") -> "Coords":
+        return Coords(self.x + other.x, self.y + other.y)
+
+    def __sub__(self, other: "Coords") -> "Coords":
+        return Coords(self.x - other.x, self.y - other.y)
+
+    def offset(self, dx: int, dy: int) -> "Coords":
+        """Return the position moved by the given deltas."""
+        return Coords(self.x + dx, self.y + dy)
+
     def chebyshev_distance(self, target):
         dx = target.x - self.x
         dy = target.y - self.y
@@ -24,4 +35,4 @@ class Coords:
         """
         Return the distance between the current entity and the given (x, y) coordinate.
         """
-        return math.sqrt((other.x - self.x) ** 2 + (self.y - self.y) ** 2)
\ No newline at end of file
+        return math.sqrt((other.x - self.x) ** 2 + (other.y - self.y) ** 2)
\ No newline at end of file
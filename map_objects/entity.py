@@ -1,14 +1,17 @@
+from __future__ import annotations
 import copy
 import math
-from typing import Optional, Tuple, Type, TypeVar, Union
+from typing import TYPE_CHECKING, Optional, Tuple, Type, TypeVar, Union
 from components.ai import BaseAI
 from components.fighter import Fighter
 from components.inventory import Inventory
 
 from map_objects.coords import Coords
-from map_objects.game_map import GameMap
 from map_objects.render_order import RenderOrder
 
+if TYPE_CHECKING:
+    from map_objects.game_map import GameMap
+
 T = TypeVar("T", bound="Entity")
 
 
@@ -38,35 +41,47 @@ class Entity:
         if parent:
             # If parent isn't provided now then it will be set later.
             self.parent = parent
-            parent.entities.add(self)
+            parent.add_entity(self)
 
     @property
     def gamemap(self) -> GameMap:
         return self.parent.gamemap
 
+    def instantiate(self: T) -> T:
+        """Return a new instance using this entity as its prototype.
+
+        Immutable data such as the name, char and color is shared with the prototype,
+        subclasses create fresh per-instance state on top of it.
+        """
+        clone = object.__new__(type(self))
+        clone.__dict__.update(self.__dict__)
+        return clone
+
     def spawn(self: T, gamemap: GameMap, spawn_location: Coords) -> T:
         """Spawn a copy of this instance at the given location."""
-        clone = copy.deepcopy(self)
+        clone = self.instantiate()
         clone.location = spawn_location
         clone.parent = gamemap
-        gamemap.entities.add(clone)
+        gamemap.add_entity(clone)
 
         return clone
 
     def move(self, dx: int, dy: int) -> None:
-        self.location.x += dx
-        self.location.y += dy
+        self.location = self.location.offset(dx, dy)
+        self.gamemap.relocate_entity(self)
 
     def place(self, location: Coords,  gamemap: Optional[GameMap] = None) -> None:
         """Place this entity at a new location.  Handles moving across GameMaps."""
-        self.location = location
-
         if gamemap:
             if hasattr(self, "parent"):  # Possibly uninitialized.
                 if self.parent is self.gamemap:
-                    self.gamemap.entities.remove(self)
+                    self.gamemap.remove_entity(self)
+            self.location = location
             self.parent = gamemap
-            gamemap.entities.add(self)
+            gamemap.add_entity(self)
+        else:
+            self.location = location
+            self.gamemap.relocate_entity(self)
     
 
 class Actor(Entity):
@@ -78,7 +93,8 @@ class Actor(Entity):
                  name: str = "<Unnamed>",
                  ai_cls: Type[BaseAI],
                  fighter: Fighter,
-                 inventory):
+                 inventory,
+                 speed: int = 100):
         super().__init__(
             location=location,
             char=char,
@@ -87,7 +103,10 @@ class Actor(Entity):
             blocks_movement=True,
             render_order=RenderOrder.ACTOR,)
 
+        self.ai_cls = ai_cls
         self.ai: Optional[BaseAI] = ai_cls(self)
+        # Actions per 100 player turns, see `TurnScheduler`.
+        self.speed = speed
 
         self.fighter = fighter
         self.fighter.parent = self
@@ -95,6 +114,18 @@ class Actor(Entity):
         self.inventory = inventory
         self.inventory.parent = self
 
+    def instantiate(self: T) -> T:
+        """Return a new actor at full health with a fresh AI and an empty inventory."""
+        clone = super().instantiate()
+        clone.ai = self.ai_cls(clone)
+        clone.fighter = Fighter(
+            hp=self.fighter.max_hp, defense=self.fighter.defense, power=self.fighter.power
+        )
+        clone.fighter.parent = clone
+        clone.inventory = Inventory(capacity=self.inventory.capacity)
+        clone.inventory.parent = clone
+        return clone
+
     @property
     def is_alive(self) -> bool:
         """Returns True as long as this actor can perform actions."""
@@ -122,3 +153,10 @@ class Item(Entity):
 
         self.consumable = consumable
         self.consumable.parent = self
+
+    def instantiate(self: T) -> T:
+        """Return a new item with its own consumable, consumables only hold immutable settings."""
+        clone = super().instantiate()
+        clone.consumable = copy.copy(self.consumable)
+        clone.consumable.parent = clone
+        return clone
@@ -1,91 +1,468 @@
-from typing import Tuple
+from typing import Callable, Dict, List, Optional, Set, Tuple
 from xml.sax.xmlreader import Locator
 import numpy
 from tcod import Console
+from tcod.map import compute_fov
+from components.actor_store import ActorStore
+from map_objects.camera import Camera
+from map_objects.chunked_array import HASH_MODULUS, BlockDigest, ChunkedArray, chunk_windows, values_hash
 from map_objects.coords import Coords
+from map_objects.entity import Actor, Item
+from map_objects.render_order import RenderOrder
+from map_objects.spatial_grid import SpatialGrid
+from map_objects.turn_scheduler import TurnScheduler
 
 import map_objects.tile_types as tile_types
 
+_NO_ENTITIES = frozenset()
+
+_WHOLE_MAP = (slice(None), slice(None))
+
+# Past this many pending regions `render` just recomposes the whole map.
+MAX_DIRTY_REGIONS = 32
+
+# Maps with more tiles than this keep their arrays in chunks, see `ChunkedArray`.
+CHUNKED_MAP_AREA = 1024 * 1024
+# Tile chunks kept in memory by chunked maps, the least recently used ones beyond that are
+# evicted to disk. Each one takes about 90KB.
+MAX_RESIDENT_CHUNKS = 256
+# How far around its end points a path is looked for, so large maps are never searched whole.
+PATHFINDING_RADIUS = 64
 
     
 class GameMap:
-    def __init__(self, engine, width: int, height: int, entities = ()):
+    def __init__(
+        self,
+        engine,
+        width: int,
+        height: int,
+        entities = (),
+        tiles: Optional[numpy.ndarray] = None,
+        chunked: Optional[bool] = None,
+    ):
         self.engine = engine
         self.width: int = width
         self.height: int = height
-        self.entities = set(entities)
-        self.tiles = self.initialize_tiles(width, height)
+        # Chunked maps only allocate the chunks that were written to, so huge mostly solid maps
+        # fit in memory, and only work on the area around the player. By default maps larger
+        # than `CHUNKED_MAP_AREA` are chunked.
+        self.chunked = width * height > CHUNKED_MAP_AREA if chunked is None else chunked
+        self.entities = set()
+        # Type partitions of `entities`, kept in sync by `add_entity`, `remove_entity`
+        # and `actor_died` so hot loops only visit the entities they care about.
+        self.actors = set()  # Every actor, dead or alive.
+        self.living_actors = set()
+        self.corpses = set()  # Actors which have died.
+        self.items = set()
+        # The sum of a hash of every items name and position, and the hash of each item, kept
+        # in sync with `items` for the state digest.
+        self.items_hash = 0
+        self._item_hashes: Dict[object, int] = {}
+        # Positions, stats and alive flags of the actors, for vectorized queries.
+        self.actor_store = ActorStore()
+        # The living actors bucketed by area, for nearest neighbour queries.
+        self.actor_grid = SpatialGrid(width, height)
+        # When each living actor acts next, dormant actors are parked here too.
+        self.scheduler = TurnScheduler(self)
+        # Entities keyed by their position, kept in sync by `add_entity`,
+        # `remove_entity` and `relocate_entity`.
+        self._entities_by_location: Dict[Coords, Set] = {}
+        # The key each entity is currently indexed under.
+        self._indexed_locations: Dict[object, Coords] = {}
+        # Entities bucketed by area in one grid per render order, so rendering only visits the
+        # entities in view, in drawing order. Kept in sync along with the location index.
+        self._render_layers: Dict[RenderOrder, SpatialGrid] = {
+            render_order: SpatialGrid(width, height) for render_order in RenderOrder
+        }
+        # The render order each entity is currently indexed under.
+        self._indexed_render_orders: Dict[object, RenderOrder] = {}
+        for entity in entities:
+            self.add_entity(entity)
+        self.tiles = self.initialize_tiles(width, height) if tiles is None else tiles
+        # The `tile_types.palette` id of every tile, kept in sync by the tile setters below so
+        # saves can store one byte per tile. None once a tile outside the palette was set.
+        self.tile_ids = self._new_array(numpy.uint8, tile_types.WALL_ID) if tiles is None else None
+        # Incremented whenever tiles are changed, so cached results derived from them can be
+        # invalidated. Call `mark_tiles_changed` after writing to `tiles` directly.
+        self.tiles_version = 0
 
-        self.visible_array = numpy.full((width, height), fill_value=False, order="F")  # Tiles the player can currently see
-        self.explored = numpy.full((width, height), fill_value=False, order="F")  # Tiles the player has seen before
-        
-    @property
-    def actors(self):
-        """Iterate over this maps living actors."""
-        yield from (
-            entity
-            for entity in self.entities
-            if type(entity).__name__ == "Actor"
-        )
+        self.visible_array = self._new_array(bool, False)  # Tiles the player can currently see
+        self.explored = self._new_array(bool, False)  # Tiles the player has seen before
+        # Incremented whenever tiles are added to `explored`, see `mark_explored`.
+        self.explored_version = 0
+        # Per block hashes of the tiles and the explored area of dense maps, see `tiles_digest`.
+        self._tiles_blocks = BlockDigest(width, height)
+        self._explored_blocks = BlockDigest(width, height)
 
-    @property
-    def items(self):
-        yield from (
-            entity 
-            for entity in self.entities 
-            if type(entity).__name__ == "Item"
-        )
+        # The composed tile graphics of the part of the map shown by the last render, the map
+        # position of its corner, and the regions of the map that are stale.
+        self._graphics: Optional[numpy.ndarray] = None
+        self._graphics_origin = (0, 0)
+        self._dirty_regions: List[Tuple[slice, slice]] = [_WHOLE_MAP]
         
     @property
     def gamemap(self):
         return self
 
     def is_visible(self, location):
-        return self.visible_array[location.x, location.y]
+        return self.visible_array[location]
         
     def is_in_bounds(self, coords: Coords) -> bool:
         """Return True if x and y are inside of the bounds of this map."""
         return 0 <= coords.x < self.width and 0 <= coords.y < self.height
 
-    def render(self, console: Console) -> None:
+    def render(self, console: Console, camera: Optional[Camera] = None) -> None:
         """  
-        Renders the map.
+        Renders the part of the map in view of `camera`, by default the part that fits on the
+        console from the top left corner of the map.
 
         If a tile is in the "visible" array, then draw it with the "light" colors.
         If it isn't, but it's in the "explored" array, then draw it with the "dark" colors.
         Otherwise, the default is "SHROUD".
+        The result is cached, only regions passed to `mark_dirty` since the last render are
+        composed again, unless the camera moved.
+        Entities are taken from the render layers in view, so the cost of a frame doesn't
+        depend on the size of the map or on the number of entities elsewhere.
         """
-        console.tiles_rgb[0:self.width, 0:self.height] = numpy.select(
-            condlist=[self.visible_array, self.explored],
-            choicelist=[self.tiles["light"], self.tiles["dark"]],
-            default=tile_types.SHROUD
-        )
+        if camera is None:
+            camera = Camera(console.width, console.height)
+        view = camera.window(self.width, self.height)
+        left, top = view[0].start, view[1].start
+        view_width, view_height = view[0].stop - left, view[1].stop - top
+        if self._graphics is None or self._graphics.shape != (view_width, view_height):
+            self._graphics = numpy.full((view_width, view_height), fill_value=tile_types.SHROUD, order="F")
+            self._dirty_regions[:] = [_WHOLE_MAP]
+        elif self._graphics_origin != (left, top):
+            self._dirty_regions[:] = [_WHOLE_MAP]
+        self._graphics_origin = (left, top)
+        for region in self._dirty_regions:
+            (start_x, stop_x), (start_y, stop_y) = region[0].indices(self.width)[:2], region[1].indices(self.height)[:2]
+            start_x, stop_x = max(start_x, left), min(stop_x, view[0].stop)
+            start_y, stop_y = max(start_y, top), min(stop_y, view[1].stop)
+            if start_x >= stop_x or start_y >= stop_y:
+                continue  # Out of view.
+            region = slice(start_x, stop_x), slice(start_y, stop_y)
+            tiles = self.tiles[region]
+            self._graphics[start_x - left:stop_x - left, start_y - top:stop_y - top] = numpy.select(
+                condlist=[self.visible_array[region], self.explored[region]],
+                choicelist=[tiles["light"], tiles["dark"]],
+                default=tile_types.SHROUD
+            )
+        self._dirty_regions.clear()
 
-        entities_sorted_for_rendering = sorted(
-            self.entities, key=lambda x: x.render_order.value
-        )
+        console.tiles_rgb[0:view_width, 0:view_height] = self._graphics
 
-        for entity in entities_sorted_for_rendering:
-            # Only print entities that are in the FOV
-            if self.visible_array[entity.location.x, entity.location.y]:
-                console.print(x=entity.location.x, y=entity.location.y, string=entity.char, fg=entity.color)
+        visible = self.visible_array[view]
+        for render_order in RenderOrder:  # In drawing order, corpses first.
+            for entity, location in self._render_layers[render_order].query_rect(
+                left, top, view[0].stop, view[1].stop
+            ):
+                # Only print entities that are in the FOV
+                if visible[location.x - left, location.y - top]:
+                    console.print(x=location.x - left, y=location.y - top, string=entity.char, fg=entity.color)
         
     def initialize_tiles(self, width: int, height: int):
-        return numpy.full((width, height), fill_value=tile_types.wall, order="F")
+        if self.chunked:
+            return ChunkedArray((width, height), tile_types.tile_dt, tile_types.wall, max_resident=MAX_RESIDENT_CHUNKS)
+        return tile_types.tiles_from_ids(numpy.full((width, height), tile_types.WALL_ID, dtype=numpy.uint8))
+
+    def _new_array(self, dtype, fill):
+        """Return a new array the size of the map, chunked if the map is."""
+        if self.chunked:
+            return ChunkedArray((self.width, self.height), dtype, fill)
+        return numpy.full((self.width, self.height), fill_value=fill, dtype=dtype, order="F")
+
+    def set_tiles_from_ids(self, ids: numpy.ndarray) -> None:
+        """Set every tile from an array of `tile_types.palette` ids the size of the map.
+
+        On chunked maps only the chunks with something other than walls get allocated.
+        """
+        if self.chunked:
+            if self.tile_ids is None:
+                self.tile_ids = self._new_array(numpy.uint8, tile_types.WALL_ID)
+            for window in chunk_windows(self.width, self.height):
+                block = numpy.asarray(ids[window])
+                if (block != tile_types.WALL_ID).any():
+                    self.tiles[window] = tile_types.tiles_from_ids(block)
+                    self.tile_ids[window] = block
+        else:
+            self.tiles = tile_types.tiles_from_ids(ids)
+            self.tile_ids = numpy.array(ids, dtype=numpy.uint8, order="F")
+        self.mark_tiles_changed()
+
+    def pathfinding_window(self, *locations: Coords, padding: int = PATHFINDING_RADIUS) -> Tuple[slice, slice]:
+        """Return the part of the map to search for paths between `locations`.
+
+        That is the area around the locations padded by `padding` tiles, clipped to the map.
+        """
+        xs = [location.x for location in locations]
+        ys = [location.y for location in locations]
+        return (
+            slice(max(0, min(xs) - padding), min(self.width, max(xs) + padding + 1)),
+            slice(max(0, min(ys) - padding), min(self.height, max(ys) + padding + 1)),
+        )
 
     def set_tiles_rect(self, rectangle: Tuple[slice, slice], tile_type):
         self.tiles[rectangle] = tile_type
+        self._set_tile_ids(rectangle, tile_type)
+        self.mark_tiles_changed(rectangle)
+
+    def set_tile(self, location: Coords, tile_type):
+        self.tiles[location] = tile_type
+        self._set_tile_ids(location, tile_type)
+        self.mark_tiles_changed((slice(location.x, location.x + 1), slice(location.y, location.y + 1)))
+
+    def _set_tile_ids(self, index, tile_type) -> None:
+        tile_id = tile_types.palette_id(tile_type)
+        if tile_id is None:
+            self.tile_ids = None  # The tiles can't be described by ids anymore.
+        elif self.tile_ids is not None:
+            self.tile_ids[index] = tile_id
+
+    def mark_tiles_changed(self, region: Tuple[slice, slice] = _WHOLE_MAP) -> None:
+        """Invalidate everything derived from the tiles in `region`, by default the whole map."""
+        self.tiles_version += 1
+        self._tiles_blocks.mark_changed(region)
+        self.mark_dirty(region)
+
+    def mark_explored(self, region: Tuple[slice, slice]) -> None:
+        """Call after adding the tiles in `region` to `explored`."""
+        self.explored_version += 1
+        self._explored_blocks.mark_changed(region)
+
+    def tiles_digest(self) -> bytes:
+        """Return a hash of the tiles, only the blocks changed since the last call are hashed again."""
+        if self.chunked:
+            return self.tiles.digest()
+        return self._tiles_blocks.digest(self.tiles)
+
+    def explored_digest(self) -> bytes:
+        """Return a hash of the explored area, only the blocks changed since the last call are hashed again."""
+        if self.chunked:
+            return self.explored.digest()
+        return self._explored_blocks.digest(self.explored)
+
+    def mark_dirty(self, region: Tuple[slice, slice] = _WHOLE_MAP) -> None:
+        """Mark a region whose tiles, visibility or exploration changed, so it is redrawn."""
+        if len(self._dirty_regions) >= MAX_DIRTY_REGIONS:
+            self._dirty_regions[:] = [_WHOLE_MAP]
+        elif self._dirty_regions != [_WHOLE_MAP]:
+            self._dirty_regions.append(region)
+
+    def add_entity(self, entity) -> None:
+        """Add an entity to this map and index it under its current location."""
+        if entity in self.entities:
+            self.relocate_entity(entity)
+            return
+        self.entities.add(entity)
+        self._index_entity(entity)
+
+        if isinstance(entity, Actor):
+            self.actor_store.add(entity)
+            self.actors.add(entity)
+            if entity.is_alive:
+                self.living_actors.add(entity)
+                self.actor_grid.insert(entity, entity.location)
+                self.scheduler.add(entity)
+            else:
+                self.corpses.add(entity)
+        elif isinstance(entity, Item):
+            self.items.add(entity)
+            self._rehash_item(entity)
+
+    def remove_entity(self, entity) -> None:
+        """Remove an entity from this map and from the location index."""
+        self.entities.remove(entity)
+        if entity in self.living_actors:
+            self.actor_grid.remove(entity, self._indexed_locations[entity])
+            self.scheduler.remove(entity)
+        self._unindex_entity(entity)
+
+        if entity in self.actors:
+            self.actor_store.remove(entity)
+        self.actors.discard(entity)
+        self.living_actors.discard(entity)
+        self.corpses.discard(entity)
+        if entity in self.items:
+            self.items.discard(entity)
+            self._rehash_item(entity)
+
+    def actor_died(self, actor) -> None:
+        """Move a dead actor from the living actors to the corpses."""
+        self.living_actors.discard(actor)
+        self.actor_grid.remove(actor, actor.location)
+        self.scheduler.remove(actor)
+        self.corpses.add(actor)
+        # Its render order changed, so move it to the matching render layer.
+        self._unindex_entity(actor)
+        self._index_entity(actor)
+        self.actor_store.mark_dead(actor.fighter.store_index)
+
+    def relocate_entity(self, entity) -> None:
+        """Move an entity to the index bucket matching its current location."""
+        old_location = self._indexed_locations[entity]
+        if old_location != entity.location:
+            self._unindex_entity(entity)
+            self._index_entity(entity)
+            if entity in self.actors:
+                self.actor_store.move(entity)
+                if entity in self.living_actors:
+                    self.actor_grid.move(entity, old_location, entity.location)
+            elif entity in self.items:
+                self._rehash_item(entity)
+
+    def _rehash_item(self, item) -> None:
+        """Update `items_hash` after an item was added, removed or moved."""
+        item_hash = 0
+        if item in self.items:
+            item_hash = values_hash(item.location.x, item.location.y, prefix=item.name.encode())
+        self.items_hash = (self.items_hash + item_hash - self._item_hashes.pop(item, 0)) % HASH_MODULUS
+        if item_hash:
+            self._item_hashes[item] = item_hash
+
+    def _index_entity(self, entity) -> None:
+        key = entity.location
+        self._indexed_locations[entity] = key
+        self._indexed_render_orders[entity] = entity.render_order
+        self._render_layers[entity.render_order].insert(entity, key)
+        bucket = self._entities_by_location.get(key)
+        if bucket is None:
+            self._entities_by_location[key] = {entity}
+        else:
+            bucket.add(entity)
+
+    def _unindex_entity(self, entity) -> None:
+        key = self._indexed_locations.pop(entity)
+        self._render_layers[self._indexed_render_orders.pop(entity)].remove(entity, key)
+        bucket = self._entities_by_location[key]
+        bucket.discard(entity)
+        if not bucket:
+            del self._entities_by_location[key]
+
+    def get_entities_at_location(self, location: Coords):
+        """Return the entities at the given location, the result must not be modified."""
+        return self._entities_by_location.get(location, _NO_ENTITIES)
+
+    def has_entity_at_location(self, location: Coords) -> bool:
+        return location in self._entities_by_location
 
     def get_blocking_entity_at_location(self, location: Coords):
-        for entity in self.entities:
-            if (entity.blocks_movement and entity.location == location):
+        for entity in self.get_entities_at_location(location):
+            if entity.blocks_movement:
                 return entity
 
         return None
 
     def get_actor_at_location(self, location: Coords):
-        for actor in self.actors:
-            if actor.location == location:
-                return actor
+        """Return the actor at the given location, living actors are preferred over corpses."""
+        corpse = None
+        for entity in self.get_entities_at_location(location):
+            if entity in self.living_actors:
+                return entity
+            if entity in self.corpses:
+                corpse = entity
 
-        return None
+        return corpse
+
+    def get_actors_in_radius(
+        self,
+        center: Coords,
+        radius: float,
+        *,
+        mask: Optional[numpy.ndarray] = None,
+        respect_walls: bool = False,
+    ) -> List[Actor]:
+        """Return the living actors within `radius` of `center`.
+
+        `mask` is an optional boolean array the size of the map, only actors on True tiles are
+        returned, e.g. pass `visible_array` to only get actors the player can see.
+        If `respect_walls` is True then actors out of sight from `center` are excluded, so an
+        area effect doesn't pass through walls.
+        The cost depends on the size of the area, or on the number of living actors if that
+        is smaller, but never on the number of other entities.
+        """
+        reach = int(radius)
+        left, top = max(0, center.x - reach), max(0, center.y - reach)
+        window = (
+            slice(left, min(self.width, center.x + reach + 1)),
+            slice(top, min(self.height, center.y + reach + 1)),
+        )
+        xs = numpy.arange(window[0].start, window[0].stop)[:, None]
+        ys = numpy.arange(window[1].start, window[1].stop)[None, :]
+        area = (xs - center.x) ** 2 + (ys - center.y) ** 2 <= radius * radius
+        if mask is not None:
+            area &= mask[window]
+        if respect_walls:
+            area &= compute_fov(
+                self.tiles["transparent"][window], (center.x - left, center.y - top), radius=reach
+            )
+        return self._living_actors_in_area(area, window)
+
+    def get_actors_in_mask(self, mask: numpy.ndarray) -> List[Actor]:
+        """Return the living actors standing on a True tile of `mask`, a boolean array the size of the map.
+
+        Only the window of `mask` around the living actors is read, as a dense array, so a
+        chunked mask such as `visible_array` on a large map works as well.
+        """
+        store = self.actor_store
+        living = store.living_indices()
+        if not len(living):
+            return []
+        xs, ys = store.x[living], store.y[living]
+        window = (slice(int(xs.min()), int(xs.max()) + 1), slice(int(ys.min()), int(ys.max()) + 1))
+        return self._living_actors_in_area(mask[window], window)
+
+    def _living_actors_in_area(self, area: numpy.ndarray, window: Tuple[slice, slice]) -> List[Actor]:
+        """Return the living actors on the True tiles of `area`, which covers `window` of the map.
+
+        Actors are returned in a stable order, sorted by their position.
+        """
+        left, top = window[0].start, window[1].start
+        if len(self.living_actors) < area.size:
+            # Fewer actors than tiles, test every actor position at once.
+            store = self.actor_store
+            living = store.living_indices()
+            x, y = store.x[living] - left, store.y[living] - top
+            inside = (x >= 0) & (x < area.shape[0]) & (y >= 0) & (y < area.shape[1])
+            living, x, y = living[inside], x[inside], y[inside]
+            found = [store.actors[index] for index in living[area[x, y]]]
+            found.sort(key=lambda actor: actor.location)
+            return found
+
+        # Fewer tiles than actors, look each tile up in the location index.
+        found = []
+        for x, y in zip(*area.nonzero()):
+            for entity in self.get_entities_at_location(Coords(int(x) + left, int(y) + top)):
+                if entity in self.living_actors:
+                    found.append(entity)
+        return found
+
+    def get_nearest_actors(
+        self,
+        center: Coords,
+        k: int = 1,
+        *,
+        max_range: Optional[float] = None,
+        visible_only: bool = False,
+        predicate: Optional[Callable[[Actor], bool]] = None,
+    ) -> List[Actor]:
+        """Return up to `k` living actors closest to `center`, nearest first.
+
+        Results can be limited to actors within `max_range`, to actors the player can see with
+        `visible_only`, and to actors accepted by `predicate`, e.g. to leave out a faction.
+        """
+        visible = self.visible_array
+
+        def accept(actor: Actor, location: Coords) -> bool:
+            if visible_only and not visible[location]:
+                return False
+            return predicate is None or predicate(actor)
+
+        filtered = visible_only or predicate is not None
+        return self.actor_grid.nearest(center, k, max_range=max_range, predicate=accept if filtered else None)
+
+    def damage_actors(self, actors: List[Actor], amount: int) -> None:
+        """Damage all of the given actors at once, killing those who reach 0 HP."""
+        self.actor_store.apply_damage(
+            numpy.array([actor.fighter.store_index for actor in actors], dtype=numpy.intp), amount
+        )
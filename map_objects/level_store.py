@@ -0,0 +1,77 @@
+import hashlib
+import json
+import os
+import random
+from typing import Optional
+
+import numpy
+
+from map_objects.coords import Coords
+from map_objects.procedual_generator import LevelData, generate_level
+
+# Bump whenever the files or the generator output change, so stale levels are never loaded.
+FORMAT_VERSION = 1
+
+
+class LevelStore:
+    """A directory of generated levels, keyed by run seed, level number and generator parameters.
+
+    Each level is kept as a `.npy` file of uint8 tile palette ids, which is memory-mapped on
+    load instead of being parsed, next to a small `.json` file with the player start and the
+    spawn table.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def key(self, seed: int, level: int, **params: int) -> str:
+        description = json.dumps(
+            {"version": FORMAT_VERSION, "seed": seed, "level": level, "params": params}, sort_keys=True
+        )
+        return hashlib.sha1(description.encode()).hexdigest()
+
+    def _paths(self, key: str):
+        base = os.path.join(self.directory, key)
+        return base + ".npy", base + ".json"
+
+    def load(self, seed: int, level: int, **params: int) -> Optional[LevelData]:
+        """Return the stored level, or None if it hasn't been stored yet.
+
+        The tiles are a read-only memory map of the file, so only the parts which are used
+        are read from disk.
+        """
+        tiles_path, spawns_path = self._paths(self.key(seed, level, **params))
+        if not os.path.exists(spawns_path):
+            return None
+        with open(spawns_path, encoding="utf-8") as spawns_file:
+            table = json.load(spawns_file)
+        tiles = numpy.load(tiles_path, mmap_mode="r")
+        return LevelData(
+            tiles,
+            Coords(*table["player_start"]),
+            [(prototype, Coords(x, y)) for prototype, x, y in table["spawns"]],
+        )
+
+    def save(self, seed: int, level: int, level_data: LevelData, **params: int) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        tiles_path, spawns_path = self._paths(self.key(seed, level, **params))
+        table = {
+            "player_start": list(level_data.player_start),
+            "spawns": [[prototype, x, y] for prototype, (x, y) in level_data.spawns],
+        }
+        # Write to temporary files first so a crash never leaves a half written level behind.
+        # The spawn table is moved into place last, as its presence marks the level as stored.
+        with open(tiles_path + ".tmp", "wb") as tiles_file:
+            numpy.save(tiles_file, numpy.asfortranarray(level_data.tiles))
+        os.replace(tiles_path + ".tmp", tiles_path)
+        with open(spawns_path + ".tmp", "w", encoding="utf-8") as spawns_file:
+            json.dump(table, spawns_file)
+        os.replace(spawns_path + ".tmp", spawns_path)
+
+    def get_or_generate(self, seed: int, level: int, rng: random.Random, **params: int) -> LevelData:
+        """Return the stored level, generating it with `rng` and storing it first if needed."""
+        level_data = self.load(seed, level, **params)
+        if level_data is None:
+            level_data = generate_level(rng=rng, **params)
+            self.save(seed, level, level_data, **params)
+        return level_data
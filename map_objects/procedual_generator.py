@@ -1,8 +1,8 @@
 import random
-from typing import TYPE_CHECKING, Iterator, List, Tuple
+from typing import TYPE_CHECKING, List, Set, Tuple
 from typing_extensions import Self
 
-import tcod
+import numpy
 from map_objects import entity_factories
 from map_objects.entity import Entity
 from map_objects.coords import Coords
@@ -30,6 +30,11 @@ class RectangularRoom:
         """Return the inner area of this room as a 2D array index."""
         return slice(self.top_left.x + 1, self.bottom_right.x), slice(self.top_left.y + 1, self.bottom_right.y)
 
+    @property
+    def outer(self) -> Tuple[slice, slice]:
+        """Return the whole area of this room including its walls as a 2D array index."""
+        return slice(self.top_left.x, self.bottom_right.x + 1), slice(self.top_left.y, self.bottom_right.y + 1)
+
     def intersects(self, other: Self) -> bool:
         """Return True if this room overlaps with another RectangularRoom."""
         return (
@@ -40,6 +45,39 @@ class RectangularRoom:
         )
 
 
+class LevelData:
+    """A generated level in compact form, without any entities or engine attached.
+
+    `tiles` holds `tile_types` palette ids, `spawns` lists the `entity_factories` prototype
+    name and location of every entity to spawn, in spawn order.
+    """
+
+    def __init__(self, tiles: numpy.ndarray, player_start: Coords, spawns: List[Tuple[str, Coords]]):
+        self.tiles = tiles
+        self.player_start = player_start
+        self.spawns = spawns
+        # Tiles already taken by the player or a spawn.
+        self.occupied: Set[Coords] = {player_start, *(location for _, location in spawns)}
+
+    @property
+    def width(self) -> int:
+        return self.tiles.shape[0]
+
+    @property
+    def height(self) -> int:
+        return self.tiles.shape[1]
+
+    def add_spawn(self, prototype: str, location: Coords) -> None:
+        self.spawns.append((prototype, location))
+        self.occupied.add(location)
+
+    def __getstate__(self):
+        return self.tiles, self.player_start, self.spawns
+
+    def __setstate__(self, state) -> None:
+        self.__init__(*state)
+
+
 def generate_dungeon(
     max_rooms: int,
     room_min_size: int,
@@ -49,102 +87,171 @@ def generate_dungeon(
     max_monsters_per_room: int,
     max_items_per_room: int,
     engine,
+    rng: random.Random,
 ) -> GameMap:
-    """Generate a new dungeon map."""
+    """Generate a new dungeon map.
+
+    Every random choice is drawn from `rng`, so the same seeded generator always produces
+    the same dungeon, see `seeding.level_rng`.
+    """
+    level = generate_level(
+        max_rooms=max_rooms,
+        room_min_size=room_min_size,
+        room_max_size=room_max_size,
+        map_width=map_width,
+        map_height=map_height,
+        max_monsters_per_room=max_monsters_per_room,
+        max_items_per_room=max_items_per_room,
+        rng=rng,
+    )
+    return build_dungeon(level, engine)
+
+
+def build_dungeon(level: LevelData, engine) -> GameMap:
+    """Turn generated level data into a live map, with the engines player and spawned entities."""
     player = engine.player
-    dungeon = GameMap(engine, map_width, map_height, entities=[player])
+    dungeon = GameMap(engine, level.width, level.height, entities=[player])
+    dungeon.set_tiles_from_ids(level.tiles)
+
+    player.place(level.player_start, dungeon)
+    for prototype, location in level.spawns:
+        getattr(entity_factories, prototype).spawn(dungeon, location)
+
+    return dungeon
+
+
+def generate_level(
+    max_rooms: int,
+    room_min_size: int,
+    room_max_size: int,
+    map_width: int,
+    map_height: int,
+    max_monsters_per_room: int,
+    max_items_per_room: int,
+    rng: random.Random,
+) -> LevelData:
+    """Generate the tiles and spawn list of a new dungeon level.
+
+    This needs no engine or game map, so it can run in worker processes.
+    """
+    level = LevelData(
+        numpy.full((map_width, map_height), fill_value=tile_types.WALL_ID, dtype=numpy.uint8, order="F"),
+        Coords(0, 0),
+        [],
+    )
 
     rooms: List[RectangularRoom] = []
+    # Tiles covered by a room or its walls, rooms may not overlap these.
+    occupied = numpy.zeros((map_width, map_height), dtype=bool, order="F")
+    # Tiles dug out so far, these are turned into floor tiles in one go at the end.
+    carved = numpy.zeros((map_width, map_height), dtype=bool, order="F")
 
     for _ in range(max_rooms):
-        room_width = random.randint(room_min_size, room_max_size)
-        room_height = random.randint(room_min_size, room_max_size)
+        room_width = rng.randint(room_min_size, room_max_size)
+        room_height = rng.randint(room_min_size, room_max_size)
 
         room_coords = Coords(
-            random.randint(0, dungeon.width - room_width - 1),
-            random.randint(0, dungeon.height - room_height - 1))
+            rng.randint(0, map_width - room_width - 1),
+            rng.randint(0, map_height - room_height - 1))
 
         new_room = RectangularRoom(room_coords, room_width, room_height)
 
-        # Run through the other rooms and see if they intersect with this one.
-        if any(new_room.intersects(other_room) for other_room in rooms):
+        # Check the area of this room against the area of every earlier room at once.
+        if occupied[new_room.outer].any():
             continue  # This room intersects, so go to the next attempt.
         # If there are no intersections then the room is valid.
+        occupied[new_room.outer] = True
 
-        dungeon.set_tiles_rect(new_room.inner, tile_types.floor)
+        carved[new_room.inner] = True
 
         if len(rooms) == 0:
             # The first room, where the player starts.
-            player.place(new_room.center, dungeon)
+            level.occupied.discard(level.player_start)
+            level.player_start = new_room.center
+            level.occupied.add(level.player_start)
         else:  # All rooms after the first.
             # Dig out a tunnel between this room and the previous one.
-            for x, y in tunnel_between(rooms[-1].center, new_room.center):
-                dungeon.tiles[x, y] = tile_types.floor
+            for segment in tunnel_between(rooms[-1].center, new_room.center, rng):
+                carved[segment] = True
 
-        place_entities(new_room, dungeon, max_monsters_per_room, max_items_per_room)
+        place_entities(new_room, level, max_monsters_per_room, max_items_per_room, rng)
 
         # Finally, append the new room to the list.
         rooms.append(new_room)
 
-    return dungeon
+    level.tiles[carved] = tile_types.FLOOR_ID
+
+    return level
 
     
-def tunnel_between(start: Coords, end: Coords) -> Iterator[Coords]:
-    """Return an L-shaped tunnel between these two points.""" 
-    if random.random() < 0.5:  # 50% chance.
+def tunnel_between(start: Coords, end: Coords, rng: random.Random) -> List[Tuple[slice, slice]]:
+    """Return an L-shaped tunnel between these two points.
+
+    The tunnel is returned as its two straight segments, each a 2D array index which can be
+    carved with a single assignment.
+    """ 
+    if rng.random() < 0.5:  # 50% chance.
         # Move horizontally, then vertically.
-        corner_x, corner_y = end.x, start.y
+        corner = Coords(end.x, start.y)
     else:
         # Move vertically, then horizontally.
-        corner_x, corner_y = start.x, end.y
+        corner = Coords(start.x, end.y)
+
+    return [straight_segment(start, corner), straight_segment(corner, end)]
+
 
-    # Generate the coordinates for this tunnel.
-    for x, y in tcod.los.bresenham((start.x, start.y), (corner_x, corner_y)).tolist():
-        yield x, y
-    for x, y in tcod.los.bresenham((corner_x, corner_y), (end.x, end.y)).tolist():
-        yield x, y
+def straight_segment(start: Coords, end: Coords) -> Tuple[slice, slice]:
+    """Return the tiles between two points on the same row or column as a 2D array index."""
+    return (
+        slice(min(start.x, end.x), max(start.x, end.x) + 1),
+        slice(min(start.y, end.y), max(start.y, end.y) + 1),
+    )
 
 
 def place_entities(
-    room: RectangularRoom, dungeon: GameMap, maximum_monsters: int, maximum_items: int
+    room: RectangularRoom,
+    level: LevelData,
+    maximum_monsters: int,
+    maximum_items: int,
+    rng: random.Random,
 ) -> None:
-    number_of_monsters = random.randint(0, maximum_monsters)
-    number_of_items = random.randint(0, maximum_items)
+    number_of_monsters = rng.randint(0, maximum_monsters)
+    number_of_items = rng.randint(0, maximum_items)
 
     for _ in range(number_of_monsters):
-        place_monster(room, dungeon)
+        place_monster(room, level, rng)
 
     for _ in range(number_of_items):
-        place_item(room, dungeon, _)
+        place_item(room, level, _, rng)
 
-def place_monster(room, dungeon):
+def place_monster(room, level: LevelData, rng: random.Random):
     monster_location = Coords(
-            random.randint(room.top_left.x + 1, room.bottom_right.x - 1),
-            random.randint(room.top_left.y + 1, room.bottom_right.y - 1))
+            rng.randint(room.top_left.x + 1, room.bottom_right.x - 1),
+            rng.randint(room.top_left.y + 1, room.bottom_right.y - 1))
 
-    if not any(entity.location == monster_location for entity in dungeon.entities):
-        if random.random() < 0.8:
-            entity_factories.orc.spawn(dungeon, monster_location)
+    if monster_location not in level.occupied:
+        if rng.random() < 0.8:
+            level.add_spawn("orc", monster_location)
         else:
-            entity_factories.troll.spawn(dungeon, monster_location)
+            level.add_spawn("troll", monster_location)
 
-def place_item(room, dungeon, _):
-    item_location = Coords(random.randint(room.top_left.x + 1, room.bottom_right.x - 1), 
-        random.randint(room.top_left.y +_ + 1, room.bottom_right.y - 1))
+def place_item(room, level: LevelData, _, rng: random.Random):
+    item_location = Coords(rng.randint(room.top_left.x + 1, room.bottom_right.x - 1), 
+        rng.randint(room.top_left.y +_ + 1, room.bottom_right.y - 1))
 
-    if not any(entity.location == item_location for entity in dungeon.entities):
-        item_chance = random.random()
+    if item_location not in level.occupied:
+        item_chance = rng.random()
 
         item = None
 
         if item_chance < 0.1:
-            item = entity_factories.health_potion
+            item = "health_potion"
         elif item_chance < 0.4:
-            item = entity_factories.confusion_scroll
+            item = "confusion_scroll"
         elif item_chance < 0.8:
-            item = entity_factories.fireball_scroll
+            item = "fireball_scroll"
         else:
-            item = entity_factories.lightning_scroll
+            item = "lightning_scroll"
 
         if item is not None:
-            item.spawn(dungeon, item_location)
+            level.add_spawn(item, item_location)
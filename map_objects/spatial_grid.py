@@ -0,0 +1,130 @@
+import heapq
+from typing import Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+from map_objects.coords import Coords
+
+
+class SpatialGrid:
+    """Buckets objects into square cells of the map for nearest neighbour and window queries.
+
+    Each cell maps its objects to their location, callers keep it up to date with
+    `insert`, `remove` and `move` as objects come, go and walk around.
+    """
+
+    def __init__(self, width: int, height: int, cell_size: int = 16):
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.cells_wide = (width + cell_size - 1) // cell_size
+        self.cells_high = (height + cell_size - 1) // cell_size
+        self._cells: Dict[Tuple[int, int], Dict[Hashable, Coords]] = {}
+
+    def _cell(self, location: Coords) -> Tuple[int, int]:
+        return location.x // self.cell_size, location.y // self.cell_size
+
+    def insert(self, item: Hashable, location: Coords) -> None:
+        self._cells.setdefault(self._cell(location), {})[item] = location
+
+    def remove(self, item: Hashable, location: Coords) -> None:
+        cell = self._cell(location)
+        bucket = self._cells[cell]
+        del bucket[item]
+        if not bucket:
+            del self._cells[cell]
+
+    def move(self, item: Hashable, old_location: Coords, new_location: Coords) -> None:
+        old_cell = self._cell(old_location)
+        new_cell = self._cell(new_location)
+        if old_cell == new_cell:
+            self._cells[old_cell][item] = new_location
+        else:
+            self.remove(item, old_location)
+            self.insert(item, new_location)
+
+    def query_rect(self, left: int, top: int, right: int, bottom: int) -> Iterator[Tuple[Hashable, Coords]]:
+        """Yield the (item, location) pairs with left <= x < right and top <= y < bottom."""
+        size = self.cell_size
+        for cell_x in range(max(0, left // size), min(self.cells_wide, (right - 1) // size + 1)):
+            for cell_y in range(max(0, top // size), min(self.cells_high, (bottom - 1) // size + 1)):
+                bucket = self._cells.get((cell_x, cell_y))
+                if not bucket:
+                    continue
+                for item, location in bucket.items():
+                    if left <= location.x < right and top <= location.y < bottom:
+                        yield item, location
+
+    def nearest(
+        self,
+        center: Coords,
+        k: int = 1,
+        *,
+        max_range: Optional[float] = None,
+        predicate: Optional[Callable[[Hashable, Coords], bool]] = None,
+    ) -> List[Hashable]:
+        """Return up to `k` items closest to `center`, nearest first.
+
+        Distances are euclidean, ties are broken by location so results are stable.
+        Only items within `max_range` and accepted by `predicate(item, location)` are returned.
+        Cells are searched in growing rings around `center`, stopping as soon as no unsearched
+        cell can hold anything closer than the `k`th best match.
+        """
+        size = self.cell_size
+        center_cell_x, center_cell_y = self._cell(center)
+        max_range_squared = None if max_range is None else max_range * max_range
+        # Max-heap of the best matches, as (-distance squared, negated location, tie breaker, item).
+        best: List[Tuple[int, Tuple[int, int], int, Hashable]] = []
+        counter = 0
+        max_ring = max(self.cells_wide, self.cells_high)
+
+        for ring in range(max_ring + 1):
+            for cell_x, cell_y in self._ring(center_cell_x, center_cell_y, ring):
+                bucket = self._cells.get((cell_x, cell_y))
+                if not bucket:
+                    continue
+                for item, location in bucket.items():
+                    dx = location.x - center.x
+                    dy = location.y - center.y
+                    distance_squared = dx * dx + dy * dy
+                    if max_range_squared is not None and distance_squared > max_range_squared:
+                        continue
+                    if predicate is not None and not predicate(item, location):
+                        continue
+                    entry = (-distance_squared, (-location.x, -location.y), counter, item)
+                    counter += 1
+                    if len(best) < k:
+                        heapq.heappush(best, entry)
+                    elif entry[:2] > best[0][:2]:
+                        heapq.heapreplace(best, entry)
+
+            # Anything outside of the searched block of cells is at least this far away.
+            bound = min(
+                center.x - (center_cell_x - ring) * size + 1,
+                (center_cell_x + ring + 1) * size - center.x,
+                center.y - (center_cell_y - ring) * size + 1,
+                (center_cell_y + ring + 1) * size - center.y,
+            )
+            if max_range is not None and bound > max_range:
+                break
+            if len(best) == k and -best[0][0] < bound * bound:
+                break
+
+        best.sort(reverse=True)
+        return [entry[3] for entry in best]
+
+    def _ring(self, center_x: int, center_y: int, ring: int) -> Iterator[Tuple[int, int]]:
+        """Yield the in-bounds cells at exactly `ring` cells (Chebyshev) from the center cell."""
+        if ring == 0:
+            yield center_x, center_y
+            return
+        left, right = center_x - ring, center_x + ring
+        top, bottom = center_y - ring, center_y + ring
+        for cell_x in range(max(0, left), min(self.cells_wide - 1, right) + 1):
+            if top >= 0:
+                yield cell_x, top
+            if bottom < self.cells_high:
+                yield cell_x, bottom
+        for cell_y in range(max(0, top + 1), min(self.cells_high - 1, bottom - 1) + 1):
+            if left >= 0:
+                yield left, cell_y
+            if right < self.cells_wide:
+                yield right, cell_y
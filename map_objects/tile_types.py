@@ -1,4 +1,4 @@
-from typing import Tuple
+from typing import Optional, Tuple
 import numpy
 
 # Tile graphics structured type compatible with Console.tiles_rgb.
@@ -46,4 +46,29 @@ wall = new_tile(
     transparent=False,
     dark=(ord(" "), (255, 255, 255), (0, 0, 100)),
     light=(ord(" "), (255, 255, 255), (130, 110, 50)),
-)
\ No newline at end of file
+)
+
+# Every tile type, indexed by the compact uint8 ids used to store maps: `palette[tile_ids]`.
+palette = numpy.array([wall, floor], dtype=tile_dt)
+WALL_ID = 0
+FLOOR_ID = 1
+
+
+def tiles_from_ids(ids: numpy.ndarray) -> numpy.ndarray:
+    """Return a new Fortran ordered array of the tiles with the given palette ids.
+
+    This is `palette[ids]`, but looks the tiles up as raw bytes, which is many times faster
+    than copying structured values one field at a time.
+    """
+    ids = numpy.asarray(ids)
+    palette_bytes = palette.view(numpy.uint8).reshape(len(palette), tile_dt.itemsize)
+    return palette_bytes[ids.T.ravel()].view(tile_dt).reshape(ids.shape[::-1]).T
+
+
+def palette_id(tile: numpy.ndarray) -> Optional[int]:
+    """Return the id of a tile type in `palette`, or None if it isn't one of them."""
+    tile_bytes = numpy.asarray(tile, dtype=tile_dt).tobytes()
+    for tile_id, palette_tile in enumerate(palette):
+        if palette_tile.tobytes() == tile_bytes:
+            return tile_id
+    return None
@@ -0,0 +1,131 @@
+import heapq
+from time import perf_counter
+from typing import Dict, List, Optional, Set, Tuple
+
+import exceptions
+from map_objects.coords import Coords
+
+# Time units in one player turn, an actor at normal speed acts once per turn.
+TURN_LENGTH = 100
+NORMAL_SPEED = 100
+# Idle monsters farther than the players sight radius plus this margin are parked until
+# something wakes them. The radius follows the sight radius, since monsters in view always act.
+ACTIVATION_MARGIN = 4
+
+
+class TurnScheduler:
+    """Decides when the monsters of a map act, in order of their next turn.
+
+    Active actors wait in a priority queue keyed by the time of their next action, an actor
+    with `speed` twice the normal speed acts twice per player turn.
+    Idle monsters far from the player are parked as dormant instead, so they cost nothing
+    until the player comes near or `make_noise` wakes them up.
+    Ties are broken by the order in which actors were scheduled, so runs are reproducible.
+    """
+
+    def __init__(self, game_map):
+        self.game_map = game_map
+        self.time = 0  # The start of the current player turn.
+        # Heap of (time of next action, sequence number, actor), entries are dropped lazily
+        # once they don't match `_entries` anymore.
+        self._queue: List[Tuple[int, int, object]] = []
+        self._entries: Dict[object, Tuple[int, int]] = {}
+        self._sequence = 0
+        self.dormant: Set = set()
+
+    @property
+    def activation_radius(self) -> int:
+        """How far from the player monsters are kept awake, see `ACTIVATION_MARGIN`."""
+        return self.game_map.engine.fov_radius + ACTIVATION_MARGIN
+
+    @property
+    def active_count(self) -> int:
+        return len(self._entries)
+
+    def next_action_time(self, actor) -> Optional[int]:
+        """Return when the actor acts next, or None if it is dormant or not scheduled."""
+        entry = self._entries.get(actor)
+        return None if entry is None else entry[0]
+
+    def scheduled(self) -> List[Tuple[int, object]]:
+        """Return (time of next action, actor) for every active actor, in the order they will act."""
+        return [(time, actor) for actor, (time, _) in sorted(self._entries.items(), key=lambda item: item[1])]
+
+    def schedule(self, actor, time: Optional[int] = None) -> None:
+        """Queue the actor to act at `time`, by default right away, replacing any earlier entry."""
+        if time is None:
+            time = self.time
+        self.dormant.discard(actor)
+        entry = (time, self._sequence)
+        self._sequence += 1
+        self._entries[actor] = entry
+        heapq.heappush(self._queue, (*entry, actor))
+
+    def add(self, actor) -> None:
+        """Start scheduling an actor which arrived on the map, the player is never scheduled."""
+        if actor is not self.game_map.engine.player:
+            self.schedule(actor)
+
+    def remove(self, actor) -> None:
+        self._entries.pop(actor, None)
+        self.dormant.discard(actor)
+
+    def park(self, actor) -> None:
+        """Make an actor dormant, it won't act until it is woken."""
+        self._entries.pop(actor, None)
+        self.dormant.add(actor)
+
+    def wake(self, actor) -> None:
+        if actor in self.dormant:
+            self.schedule(actor)
+
+    def wake_in_radius(self, center: Coords, radius: float) -> None:
+        """Wake the dormant actors within `radius` of `center`."""
+        if not self.dormant:
+            return
+        reach = int(radius)
+        found = [
+            (location, actor)
+            for actor, location in self.game_map.actor_grid.query_rect(
+                center.x - reach, center.y - reach, center.x + reach + 1, center.y + reach + 1
+            )
+            if actor in self.dormant and center.distance(location) <= radius
+        ]
+        # Wake in position order, so the order they act in doesn't depend on the grids layout.
+        found.sort(key=lambda pair: pair[0])
+        for _, actor in found:
+            self.schedule(actor)
+
+    def make_noise(self, location: Coords, radius: float) -> None:
+        """A loud noise at `location`, dormant actors which can hear it wake up."""
+        self.wake_in_radius(location, radius)
+
+    def run_turn(self) -> None:
+        """Let every actor due before the end of this player turn act, then start the next turn."""
+        self.wake_in_radius(self.game_map.engine.player.location, self.activation_radius)
+        end = self.time + TURN_LENGTH
+        queue = self._queue
+        timings = self.game_map.engine.timings
+        while queue and queue[0][0] < end:
+            time, sequence, actor = heapq.heappop(queue)
+            if self._entries.get(actor) != (time, sequence):
+                continue  # Rescheduled, parked or removed since this entry was queued.
+            del self._entries[actor]
+            if not actor.is_alive:
+                continue
+            if actor.ai.is_idle() and not self._near_player(actor):
+                self.park(actor)
+                continue
+            ai = actor.ai
+            start = perf_counter()
+            try:
+                ai.perform()
+            except exceptions.Impossible:
+                pass  # Ignore impossible action exceptions from AI
+            timings.record("enemy." + type(ai).__name__, perf_counter() - start)
+            if actor.is_alive and actor not in self._entries and actor not in self.dormant:
+                self.schedule(actor, time + TURN_LENGTH * NORMAL_SPEED // actor.speed)
+        self.time = end
+
+    def _near_player(self, actor) -> bool:
+        return actor.location.distance(self.game_map.engine.player.location) <= self.activation_radius
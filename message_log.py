@@ -1,16 +1,24 @@
-from typing import Iterable, List, Reversible, Tuple
+from collections import deque
+from itertools import islice
+from typing import Deque, Iterable, List, Optional, Sequence, Tuple
 import textwrap
 
 import tcod
 
 import color
 
+# How many messages a log keeps by default, older ones are dropped.
+MAX_MESSAGES = 1000
+
 
 class Message:
     def __init__(self, text: str, fg: Tuple[int, int, int]):
         self.plain_text = text
         self.fg = fg
         self.count = 1 # to merge same message into one, e.g. "Orc attacked (3x)"
+        # The last result of `wrapped`, with the width and count it was made for.
+        self._wrapped_key: Optional[Tuple[int, int]] = None
+        self._wrapped_lines: List[str] = []
 
     @property
     def full_text(self) -> str:
@@ -19,10 +27,19 @@ class Message:
             return f"{self.plain_text} (x{self.count})"
         return self.plain_text
 
+    def wrapped(self, width: int) -> List[str]:
+        """Return the full text wrapped to `width`, the result is cached and must not be modified."""
+        key = (width, self.count)
+        if key != self._wrapped_key:
+            self._wrapped_lines = list(MessageLog.wrap(self.full_text, width))
+            self._wrapped_key = key
+        return self._wrapped_lines
+
 
 class MessageLog:
-    def __init__(self) -> None:
-        self.messages: List[Message] = []
+    def __init__(self, max_messages: Optional[int] = MAX_MESSAGES) -> None:
+        """Only the last `max_messages` messages are kept, or every message if it is None."""
+        self.messages: Deque[Message] = deque(maxlen=max_messages)
 
     def add_message(
         self, text: str, fg: Tuple[int, int, int] = color.white, *, stack: bool = True,
@@ -62,16 +79,22 @@ class MessageLog:
         y: int,
         width: int,
         height: int,
-        messages: Reversible[Message],
+        messages: Sequence[Message],
+        end: Optional[int] = None,
     ) -> None:
         """Render the messages provided.
         The `messages` are rendered starting at the last message and working
-        backwards.
+        backwards. If `end` is given rendering starts at the message before
+        that index instead, without copying `messages`.
         """
         y_offset = height - 1
 
-        for message in reversed(messages):
-            for line in reversed(list(cls.wrap(message.full_text, width))):
+        newest_first: Iterable[Message] = reversed(messages)
+        if end is not None:
+            newest_first = islice(newest_first, max(0, len(messages) - end), None)
+
+        for message in newest_first:
+            for line in reversed(message.wrapped(width)):
                 console.print(x=x, y=y + y_offset, string=line, fg=message.fg)
                 y_offset -= 1
                 if y_offset < 0:
@@ -59,12 +59,22 @@ def render_bar(console: libtcod.Console, current_value: int, maximum_value: int,
         x=1, y=45, string=f"HP: {current_value}/{maximum_value}", fg=color.bar_text
     )
 
+def render_timings(console: libtcod.Console, x: int, y: int, timings) -> None:
+    """Draw the rolling percentiles of every timed phase, in milliseconds."""
+    console.print(x=x, y=y, string=f"{'phase':<22}{'p50':>7}{'p90':>7}{'p99':>7}", fg=color.white, bg=color.black)
+    for offset, stats in enumerate(timings, start=1):
+        p50, p90, p99 = (value * 1000 for value in stats.percentiles((50, 90, 99)))
+        console.print(
+            x=x, y=y + offset, string=f"{stats.name:<22}{p50:7.2f}{p90:7.2f}{p99:7.2f}", fg=color.white, bg=color.black
+        )
+
 def get_names_at_location(x: int, y: int, game_map) -> str:
-    if not game_map.is_in_bounds(Coords(x, y)) or not game_map.visible_array[x, y]:
+    location = Coords(x, y)
+    if not game_map.is_in_bounds(location) or not game_map.visible_array[location]:
         return ""
 
     names = ", ".join(
-        entity.name for entity in game_map.entities if entity.location.x == x and entity.location.y == y
+        entity.name for entity in game_map.get_entities_at_location(location)
     )
 
     return names.capitalize()
@@ -0,0 +1,191 @@
+"""Record the actions of a game and replay them headless, as fast as the engine can go.
+
+Example:
+    python replay.py replays/123456.jsonl --repeat 5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+from actions import (
+    Action,
+    ActionWithDirection,
+    BumpAction,
+    DropItem,
+    ItemAction,
+    MeleeAction,
+    MovementAction,
+    PickupAction,
+    WaitAction,
+)
+from engine import Engine
+from map_objects.level_store import LevelStore
+from seeding import new_run_seed
+from setup_game import new_engine
+from state_digest import StateDigest
+
+FORMAT_VERSION = 2
+
+# Entries of this type hold the state digest after a turn, instead of an action.
+CHECKSUM = "Checksum"
+
+# Player actions by the name they are recorded under.
+ACTION_CLASSES = {
+    cls.__name__: cls
+    for cls in (BumpAction, MeleeAction, MovementAction, WaitAction, PickupAction, ItemAction, DropItem)
+}
+
+
+def encode_action(engine: Engine, action: Action) -> list:
+    """Return the action as [turn, action type, parameters...], items are referred to by inventory slot."""
+    entry = [engine.turn, type(action).__name__]
+    if isinstance(action, ActionWithDirection):
+        entry += [action.dx, action.dy]
+    elif isinstance(action, ItemAction):
+        target_x, target_y = action.target_xy
+        entry += [action.entity.inventory.items.index(action.item), target_x, target_y]
+    return entry
+
+
+def decode_action(engine: Engine, entry: list) -> Action:
+    """Return the action of a recorded entry, performed by the player of `engine`."""
+    cls = ACTION_CLASSES[entry[1]]
+    player = engine.player
+    if issubclass(cls, ActionWithDirection):
+        return cls(player, entry[2], entry[3])
+    if issubclass(cls, ItemAction):
+        return cls(player, player.inventory.items[entry[2]], (entry[3], entry[4]))
+    return cls(player)
+
+
+class ActionRecorder:
+    """Records every action handled by the players event handlers, see `EventHandler.handle_action`.
+
+    The recording is a JSON lines file, a header with the `setup_game.new_engine` arguments of
+    the game, including its seed, followed by one line per action.
+    After every turn a [turn, "Checksum", digest] line holds the `StateDigest` of the game,
+    so replays can tell where they stopped matching.
+    The first `flush` of a new recording replaces any file already at `path`, after that, and
+    for a recording resumed with `load`, new entries are appended to the file.
+    """
+
+    def __init__(self, path: str, params: Dict, entries: Optional[List[list]] = None):
+        self.path = path
+        self.params = params
+        self.entries: List[list] = [] if entries is None else entries
+        self._flushed = len(self.entries)
+        self._header_written = entries is not None  # Only a loaded recording already has its file.
+        self.state_digest = StateDigest()
+
+    @classmethod
+    def load(cls, path: str) -> "ActionRecorder":
+        """Return the recording at `path`, new actions are added to the end of it."""
+        with open(path, encoding="utf-8") as file:
+            header = json.loads(file.readline())
+            if header["version"] != FORMAT_VERSION:
+                raise ValueError(f"Unsupported replay format version {header['version']}.")
+            entries = [json.loads(line) for line in file]
+        return cls(path, header["params"], entries)
+
+    def record(self, engine: Engine, action: Action) -> None:
+        self.entries.append(encode_action(engine, action))
+
+    def record_checksum(self, engine: Engine) -> None:
+        self.entries.append([engine.turn, CHECKSUM, self.state_digest.digest(engine)])
+
+    def flush(self) -> None:
+        """Write the actions recorded since the last flush to the file."""
+        if not self._header_written:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as file:
+                file.write(json.dumps({"version": FORMAT_VERSION, "params": self.params}) + "\n")
+            self._header_written = True
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.writelines(json.dumps(entry) + "\n" for entry in self.entries[self._flushed:])
+        self._flushed = len(self.entries)
+
+
+def new_recorded_engine(
+    path: str, seed: Optional[int] = None, level_store: Optional[LevelStore] = None, **params
+) -> Engine:
+    """Return a new game from `setup_game.new_engine`, with the players actions recorded to `path`."""
+    if seed is None:
+        seed = new_run_seed()
+    engine = new_engine(seed=seed, level_store=level_store, **params)
+    engine.recorder = ActionRecorder(path, dict(seed=seed, **params))
+    return engine
+
+
+class ReplayResult:
+    def __init__(self, engine: Engine, actions: int, elapsed: float, desync_turn: Optional[int] = None):
+        self.engine = engine
+        self.actions = actions
+        self.elapsed = elapsed
+        # The first turn after which the game didn't match the recording, if any.
+        self.desync_turn = desync_turn
+
+    @property
+    def turns(self) -> int:
+        return self.engine.turn
+
+    @property
+    def turns_per_second(self) -> float:
+        if self.elapsed <= 0:
+            return 0.0
+        return self.turns / self.elapsed
+
+    def __str__(self) -> str:
+        text = (
+            f"{self.turns} turns from {self.actions} actions in {self.elapsed:.3f}s "
+            f"({self.turns_per_second:.1f} turns/s)"
+        )
+        if self.desync_turn is not None:
+            text += f", desync after turn {self.desync_turn}"
+        return text
+
+
+def replay(recording: ActionRecorder, verify: bool = True) -> ReplayResult:
+    """Play a recording again from a new game, without a window and without rendering.
+
+    If `verify` is True the state is compared with every recorded checksum, and the replay
+    stops at the first turn that doesn't match.
+    Only the replay itself is timed, not generating the dungeon.
+    """
+    engine = new_engine(**recording.params)
+    handle_action = engine.event_handler.handle_action
+    state_digest = StateDigest()
+    actions = 0
+    start = time.perf_counter()
+    for entry in recording.entries:
+        if entry[1] == CHECKSUM:
+            if verify and state_digest.digest(engine) != entry[2]:
+                return ReplayResult(engine, actions, time.perf_counter() - start, desync_turn=entry[0])
+            continue
+        # Every action goes through the main handler, targeting handlers only pick the target.
+        handle_action(decode_action(engine, entry))
+        actions += 1
+    return ReplayResult(engine, actions, time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="a recording written by ActionRecorder")
+    parser.add_argument("--repeat", type=int, default=1, help="replay this many times and report each run")
+    parser.add_argument("--no-verify", action="store_true", help="don't compare the recorded checksums")
+    args = parser.parse_args()
+
+    recording = ActionRecorder.load(args.path)
+    for _ in range(args.repeat):
+        result = replay(recording, verify=not args.no_verify)
+        print(result)
+        if result.desync_turn is not None:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
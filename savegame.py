@@ -0,0 +1,348 @@
+"""Save and load the whole game state as one uncompressed NumPy `.npz` archive.
+
+The map arrays are written as raw buffers and the entities as a flat table with one row
+per entity, so neither direction walks the `parent` references between game objects.
+Chunked maps write the allocated chunks of each array, with their keys.
+"""
+import json
+import os
+from typing import Dict, List
+
+import numpy
+
+from components.actor_store import POSITION_COLUMNS, STAT_COLUMNS
+from components.ai import ConfusedEnemy, HostileEnemy
+from components.consumable import (
+    ConfusionConsumable,
+    FireballDamageConsumable,
+    HealingConsumable,
+    LightningDamageConsumable,
+)
+from components.fighter import Fighter
+from components.inventory import Inventory
+from engine import Engine
+from input_handlers import GameOverEventHandler
+from map_objects import tile_types
+from map_objects.coords import Coords
+from map_objects.entity import Actor, Item
+from map_objects.game_map import GameMap
+from map_objects.render_order import RenderOrder
+from message_log import Message
+from replay import ActionRecorder
+
+FORMAT_VERSION = 2
+
+# AI classes by their code in the entity table, 0 means no AI.
+AI_CLASSES = (None, HostileEnemy, ConfusedEnemy)
+# Consumable classes by their code in the entity table, with the settings saved for each.
+CONSUMABLE_PARAMS = {
+    HealingConsumable: ("amount",),
+    LightningDamageConsumable: ("damage", "maximum_range"),
+    ConfusionConsumable: ("number_of_turns",),
+    FireballDamageConsumable: ("damage", "radius"),
+}
+CONSUMABLE_CLASSES = tuple(CONSUMABLE_PARAMS)
+MAX_CONSUMABLE_PARAMS = 2
+
+ACTOR, ITEM = 0, 1
+
+# The map arrays which may be saved, tiles are saved as their palette ids when possible.
+MAP_ARRAYS = ("tile_ids", "tiles", "visible", "explored")
+
+# Columns of the entity table which only actors have, items have the default values.
+ACTOR_COLUMNS = (
+    "capacity", "speed", "next_action", "action_order", "dormant", "ai_cls", "ai", "previous_ai",
+    "turns_remaining", "path_start", "path_length",
+)
+
+# The columns of the entity table, one row per entity.
+COLUMN_DTYPES = {
+    "kind": numpy.uint8,
+    "x": numpy.int32,
+    "y": numpy.int32,
+    "char": numpy.int32,
+    "color": numpy.uint8,
+    "render_order": numpy.uint8,
+    "blocks_movement": bool,
+    "holder": numpy.int32,  # Row of the actor carrying this item, -1 if it is on the map.
+    "hp": numpy.int32,
+    "max_hp": numpy.int32,
+    "defense": numpy.int32,
+    "power": numpy.int32,
+    "capacity": numpy.int32,
+    "speed": numpy.int32,
+    "next_action": numpy.int64,  # When the actor acts next, -1 if it isn't scheduled.
+    "action_order": numpy.int32,  # Breaks ties between actors acting at the same time.
+    "dormant": bool,
+    "ai_cls": numpy.uint8,
+    "ai": numpy.uint8,
+    "previous_ai": numpy.uint8,
+    "turns_remaining": numpy.int32,
+    "path_start": numpy.int32,
+    "path_length": numpy.int32,
+    "consumable": numpy.uint8,
+    "consumable_params": numpy.int32,
+}
+
+
+def save_game(engine: Engine, path: str) -> None:
+    """Write the game to `path`, replacing any earlier save only once writing succeeded.
+
+    The actions recorded so far are flushed too, so the recording continues where the save does.
+    """
+    game_map = engine.game_map
+    store = game_map.actor_store
+
+    # Actors in actor store order, so enemies keep taking turns in the same order after loading.
+    actor_rows = store.in_use.nonzero()[0]
+    actors: List = [store.actors[index] for index in actor_rows]
+    items: List = sorted(game_map.items, key=lambda item: (item.location, item.name))
+    holders: List[int] = [-1] * (len(actors) + len(items))
+    for holder, actor in enumerate(actors):
+        for item in actor.inventory.items:
+            items.append(item)
+            holders.append(holder)
+    rows = actors + items
+
+    # Columns are gathered as lists and turned into arrays at the end, which is much faster
+    # than writing into arrays one value at a time. Actor stats and positions are sliced
+    # straight out of the actor store.
+    columns: Dict[str, List] = {
+        "kind": [ACTOR] * len(actors) + [ITEM] * len(items),
+        "char": [ord(entity.char) for entity in rows],
+        "color": [entity.color for entity in rows],
+        "render_order": [entity.render_order.value for entity in rows],
+        "blocks_movement": [entity.blocks_movement for entity in rows],
+        "holder": holders,
+    }
+    for name in ACTOR_COLUMNS:
+        columns[name] = []
+    paths: List = []
+    scheduler = game_map.scheduler
+    scheduled = {actor: (time, order) for order, (time, actor) in enumerate(scheduler.scheduled())}
+    dormant = scheduler.dormant
+    for actor in actors:
+        next_action, action_order = scheduled.get(actor, (-1, 0))
+        turns_remaining = path_start = path_length = previous_ai = 0
+        ai = actor.ai
+        ai_code = AI_CLASSES.index(type(ai) if ai else None)
+        if isinstance(ai, ConfusedEnemy):
+            turns_remaining = ai.turns_remaining
+            ai = ai.previous_ai
+            previous_ai = AI_CLASSES.index(type(ai) if ai else None)
+        if isinstance(ai, HostileEnemy):
+            path_start, path_length = len(paths), len(ai.path)
+            paths += ai.path
+        columns["capacity"].append(actor.inventory.capacity)
+        columns["speed"].append(actor.speed)
+        columns["next_action"].append(next_action)
+        columns["action_order"].append(action_order)
+        columns["dormant"].append(actor in dormant)
+        columns["ai_cls"].append(AI_CLASSES.index(actor.ai_cls))
+        columns["ai"].append(ai_code)
+        columns["previous_ai"].append(previous_ai)
+        columns["turns_remaining"].append(turns_remaining)
+        columns["path_start"].append(path_start)
+        columns["path_length"].append(path_length)
+    for name in ACTOR_COLUMNS:
+        columns[name] += [-1 if name == "next_action" else 0] * len(items)
+
+    columns["consumable"] = [0] * len(actors)
+    columns["consumable_params"] = [[0] * MAX_CONSUMABLE_PARAMS] * len(actors)
+    for item in items:
+        consumable = item.consumable
+        consumable_params = [0] * MAX_CONSUMABLE_PARAMS
+        for column, param in enumerate(CONSUMABLE_PARAMS[type(consumable)]):
+            consumable_params[column] = getattr(consumable, param)
+        columns["consumable"].append(CONSUMABLE_CLASSES.index(type(consumable)))
+        columns["consumable_params"].append(consumable_params)
+
+    columns["x"] = [item.location.x for item in items]
+    columns["y"] = [item.location.y for item in items]
+    table = {name: numpy.array(values, dtype=COLUMN_DTYPES[name]) for name, values in columns.items()}
+    for name in POSITION_COLUMNS:
+        table[name] = numpy.concatenate([getattr(store, name)[actor_rows], table[name]])
+    for name in STAT_COLUMNS:
+        table[name] = numpy.concatenate(
+            [getattr(store, name)[actor_rows], numpy.zeros(len(items), dtype=COLUMN_DTYPES[name])]
+        )
+
+    header = {
+        "version": FORMAT_VERSION,
+        "seed": engine.seed,
+        "rng_state": engine.rng.getstate(),
+        "fov_radius": engine.fov_radius,
+        "size": [game_map.width, game_map.height],
+        "chunked": game_map.chunked,
+        "scheduler_time": scheduler.time,
+        "turn": engine.turn,
+        "replay": engine.recorder.path if engine.recorder is not None else None,
+        "player": rows.index(engine.player),
+        "names": [entity.name for entity in rows],
+        "messages": [[message.plain_text, message.fg, message.count] for message in engine.message_log.messages],
+    }
+
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as save_file:
+        numpy.savez(
+            save_file,
+            header=numpy.frombuffer(json.dumps(header).encode(), dtype=numpy.uint8),
+            **_map_arrays(game_map),
+            paths=numpy.array(paths, dtype=numpy.int32).reshape(-1, 2),
+            **table,
+        )
+    os.replace(temporary_path, path)
+    if engine.recorder is not None:
+        engine.recorder.flush()
+
+
+def load_game(path: str) -> Engine:
+    """Return a new engine with the game saved at `path`."""
+    with numpy.load(path) as data:
+        header = json.loads(data["header"].tobytes())
+        if header["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported save format version {header['version']}.")
+        map_arrays = {name: data[name] for name in data.files if name.startswith(MAP_ARRAYS)}
+        # Plain lists are much faster than arrays to read one value at a time.
+        table = {name: data[name].tolist() for name in data.files if name in COLUMN_DTYPES or name == "paths"}
+
+    names = header["names"]
+    paths = table["paths"]
+    entities: List = []
+    for row, name in enumerate(names):
+        location = Coords(table["x"][row], table["y"][row])
+        char = chr(table["char"][row])
+        entity_color = tuple(table["color"][row])
+        if table["kind"][row] == ACTOR:
+            fighter = Fighter(hp=table["max_hp"][row], defense=table["defense"][row], power=table["power"][row])
+            fighter.detached_stats["hp"] = table["hp"][row]
+            entity = Actor(
+                location=location,
+                char=char,
+                color=entity_color,
+                name=name,
+                ai_cls=AI_CLASSES[table["ai_cls"][row]],
+                fighter=fighter,
+                inventory=Inventory(capacity=table["capacity"][row]),
+                speed=table["speed"][row],
+            )
+        else:
+            consumable_cls = CONSUMABLE_CLASSES[table["consumable"][row]]
+            params = CONSUMABLE_PARAMS[consumable_cls]
+            entity = Item(
+                location=location,
+                char=char,
+                color=entity_color,
+                name=name,
+                consumable=consumable_cls(**dict(zip(params, table["consumable_params"][row]))),
+            )
+        entity.render_order = RenderOrder(table["render_order"][row])
+        entity.blocks_movement = table["blocks_movement"][row]
+        entities.append(entity)
+
+    engine = Engine(player=entities[header["player"]], seed=header["seed"])
+    state = header["rng_state"]
+    engine.rng.setstate((state[0], tuple(state[1]), state[2]))
+    engine.fov_radius = header["fov_radius"]
+    engine.turn = header["turn"]
+    if header["replay"] is not None and os.path.exists(header["replay"]):
+        engine.recorder = ActionRecorder.load(header["replay"])
+    engine.message_log.messages.clear()
+    for text, fg, count in header["messages"]:
+        message = Message(text, tuple(fg))
+        message.count = count
+        engine.message_log.messages.append(message)
+
+    width, height = header["size"]
+    if header["chunked"]:
+        game_map = GameMap(engine, width, height, chunked=True)
+        if "tile_ids_keys" in map_arrays:
+            keys, chunks = map_arrays["tile_ids_keys"], map_arrays["tile_ids_chunks"]
+            game_map.tile_ids.load_chunks(keys, chunks)
+            game_map.tiles.load_chunks(keys, (tile_types.tiles_from_ids(chunk) for chunk in chunks))
+        else:
+            game_map.tiles.load_chunks(map_arrays["tiles_keys"], map_arrays["tiles_chunks"])
+            game_map.tile_ids = None
+        for name, array in (("visible", game_map.visible_array), ("explored", game_map.explored)):
+            array.load_chunks(map_arrays[name + "_keys"], map_arrays[name + "_chunks"])
+    else:
+        if "tile_ids" in map_arrays:
+            tile_ids = map_arrays["tile_ids"]
+            game_map = GameMap(engine, width, height, tiles=tile_types.tiles_from_ids(tile_ids), chunked=False)
+            game_map.tile_ids = tile_ids
+        else:
+            game_map = GameMap(engine, width, height, tiles=map_arrays["tiles"], chunked=False)
+        game_map.visible_array = map_arrays["visible"]
+        game_map.explored = map_arrays["explored"]
+    engine.game_map = game_map
+
+    # AIs are set up once every actor exists, they refer to the engine through the map.
+    for row, entity in enumerate(entities):
+        holder = table["holder"][row]
+        if holder >= 0:
+            owner = entities[holder].inventory
+            entity.parent = owner
+            owner.items.append(entity)
+            continue
+        entity.parent = game_map
+        if isinstance(entity, Actor):
+            entity.ai = _load_ai(entity, table, row, paths, engine)
+        game_map.add_entity(entity)
+
+    # Restore the turn order, adding the actors above scheduled all of them right away.
+    scheduler = game_map.scheduler
+    scheduler.time = header["scheduler_time"]
+    next_actions = table["next_action"]
+    scheduled_rows = [row for row, time in enumerate(next_actions) if time >= 0]
+    scheduled_rows.sort(key=lambda row: (next_actions[row], table["action_order"][row]))
+    for row in scheduled_rows:
+        scheduler.schedule(entities[row], next_actions[row])
+    for row, dormant in enumerate(table["dormant"]):
+        if dormant:
+            scheduler.park(entities[row])
+
+    if not engine.player.is_alive:
+        engine.event_handler = GameOverEventHandler(engine)
+    return engine
+
+
+def _map_arrays(game_map: GameMap) -> Dict[str, numpy.ndarray]:
+    """Return the map arrays to save by name, for chunked maps the keys and data of their chunks.
+
+    Tiles are saved as their one byte palette ids, unless the map has tiles outside the palette.
+    """
+    arrays = {"visible": game_map.visible_array, "explored": game_map.explored}
+    if game_map.tile_ids is not None:
+        arrays["tile_ids"] = game_map.tile_ids
+    else:
+        arrays["tiles"] = game_map.tiles
+    if not game_map.chunked:
+        return arrays
+    saved = {}
+    for name, array in arrays.items():
+        keys = []
+        chunks = numpy.empty((array.chunk_count, array.chunk_size, array.chunk_size), dtype=array.dtype)
+        for index, (key, chunk) in enumerate(array.iter_chunks()):
+            keys.append(key)
+            chunks[index] = chunk
+        saved[name + "_keys"] = numpy.array(keys, dtype=numpy.int32).reshape(-1, 2)
+        saved[name + "_chunks"] = chunks
+    return saved
+
+
+def _load_ai(actor: Actor, table: Dict[str, List], row: int, paths: List, engine: Engine):
+    ai_cls = AI_CLASSES[table["ai"][row]]
+    if ai_cls is None:
+        return None
+    hostile_cls = ai_cls
+    if ai_cls is ConfusedEnemy:
+        hostile_cls = AI_CLASSES[table["previous_ai"][row]]
+    hostile = hostile_cls(actor) if hostile_cls is not None else None
+    if isinstance(hostile, HostileEnemy):
+        start = table["path_start"][row]
+        hostile.path = [tuple(step) for step in paths[start:start + table["path_length"][row]]]
+    if ai_cls is ConfusedEnemy:
+        return ConfusedEnemy(
+            actor, previous_ai=hostile, turns_remaining=table["turns_remaining"][row], rng=engine.rng
+        )
+    return hostile
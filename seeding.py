@@ -0,0 +1,21 @@
+"""Derive independent, reproducible random streams from a single run seed."""
+import random
+
+
+def new_run_seed() -> int:
+    """Return a fresh seed for a new game."""
+    return random.SystemRandom().randrange(2 ** 32)
+
+
+def rng_for(seed: int, *stream) -> random.Random:
+    """Return a random number generator for one named stream of a run.
+
+    The same seed and stream always give the same sequence, on any machine and in any
+    process, e.g. `rng_for(seed, "level", 3)` always generates the same third level.
+    """
+    return random.Random(":".join(str(part) for part in (seed,) + stream))
+
+
+def level_rng(seed: int, level: int) -> random.Random:
+    """Return the random stream used to generate the given level of a run."""
+    return rng_for(seed, "level", level)
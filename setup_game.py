@@ -0,0 +1,58 @@
+"""Starting new games, shared by the game itself, headless runs, replays and benchmarks."""
+from typing import Optional
+
+from engine import Engine
+from map_objects import entity_factories
+from map_objects.level_store import LevelStore
+from map_objects.procedual_generator import build_dungeon, generate_level
+from seeding import level_rng, new_run_seed
+import color
+
+# The size of the game window in tiles, offscreen consoles use it too.
+SCREEN_WIDTH = 80
+SCREEN_HEIGHT = 50
+
+
+def new_engine(
+    seed: Optional[int] = None,
+    map_width: int = 80,
+    map_height: int = 43,
+    room_min_size: int = 6,
+    room_max_size: int = 10,
+    max_rooms: int = 30,
+    max_monsters_per_room: int = 2,
+    max_items_per_room: int = 2,
+    level_store: Optional[LevelStore] = None,
+) -> Engine:
+    """Return a brand new game, with a freshly generated dungeon and no window attached.
+
+    The same `seed` always gives the same game, a new one is picked if it isn't given.
+    If `level_store` is given the dungeon is loaded from it when it was stored before, and
+    stored in it otherwise.
+    """
+    if seed is None:
+        seed = new_run_seed()
+    player = entity_factories.player.instantiate()
+
+    engine = Engine(player=player, seed=seed)
+
+    params = dict(
+        max_rooms=max_rooms,
+        room_min_size=room_min_size,
+        room_max_size=room_max_size,
+        map_width=map_width,
+        map_height=map_height,
+        max_monsters_per_room=max_monsters_per_room,
+        max_items_per_room=max_items_per_room,
+    )
+    if level_store is None:
+        level = generate_level(rng=level_rng(seed, 1), **params)
+    else:
+        level = level_store.get_or_generate(seed, 1, level_rng(seed, 1), **params)
+    engine.game_map = build_dungeon(level, engine)
+
+    engine.update_fov()
+    engine.message_log.add_message(
+        "Hello and welcome, adventurer, to yet another dungeon!", color.welcome_text
+    )
+    return engine
@@ -0,0 +1,58 @@
+"""Short checksums of the game state, cheap enough to take after every turn."""
+import hashlib
+import struct
+
+import numpy
+
+from components.ai import ConfusedEnemy, HostileEnemy
+
+# Codes of the AI classes in the digest, anything else is 0.
+AI_CODES = {HostileEnemy: 1, ConfusedEnemy: 2}
+
+
+class StateDigest:
+    """Computes `digest(engine)`, a checksum of everything that decides how a game plays out.
+
+    It covers the tiles, the explored area, every actors position, HP and alive flag, the
+    name and position of every item on the map, the state of the awake monsters AI, the
+    players inventory and the engines random stream.
+    It is computed incrementally: the map arrays are hashed per block and only the blocks
+    changed since the last digest are hashed again, the actors and items parts are running
+    sums kept by the actor store and the map, and only the awake monsters are visited, so a
+    digest costs little on large maps. Equal games have equal digests, however they were loaded or saved in between.
+    """
+
+    def digest(self, engine) -> str:
+        game_map = engine.game_map
+        hasher = hashlib.blake2b(digest_size=8)
+        hasher.update(game_map.tiles_digest())
+        hasher.update(game_map.explored_digest())
+        hasher.update(actors_digest(game_map))
+        hasher.update(game_map.items_hash.to_bytes(8, "little"))
+        hasher.update(schedule_digest(game_map))
+        hasher.update(" ".join(item.name for item in engine.player.inventory.items).encode())
+        # The Mersenne Twister state is 32 bit words, followed by a position below 625.
+        rng_state = engine.rng.getstate()[1]
+        hasher.update(struct.pack(f"<{len(rng_state)}I", *rng_state))
+        hasher.update(struct.pack("<q", engine.turn))
+        return hasher.hexdigest()
+
+
+def actors_digest(game_map) -> bytes:
+    """Return a hash of the position, HP and alive flag of every actor, see `ActorStore.state_hash`."""
+    return game_map.actor_store.state_hash.to_bytes(8, "little")
+
+
+def schedule_digest(game_map) -> bytes:
+    """Return a hash of when each awake monster acts next and of the state of its AI."""
+    scheduler = game_map.scheduler
+    values = [scheduler.time, len(scheduler.dormant)]
+    for time, actor in scheduler.scheduled():
+        ai = actor.ai
+        values += (time, actor.location.x, actor.location.y, AI_CODES.get(type(ai), 0))
+        if isinstance(ai, ConfusedEnemy):
+            values.append(ai.turns_remaining)
+            ai = ai.previous_ai
+        if isinstance(ai, HostileEnemy):
+            values.append(len(ai.path))
+    return hashlib.blake2b(numpy.array(values, dtype=numpy.int64), digest_size=8).digest()